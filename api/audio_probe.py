@@ -0,0 +1,275 @@
+import os
+import re
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+
+from digests import digest_file
+from video import FFMPEG_BINARY
+
+AUDIO_PROBE_CACHE_SIZE = 4096
+
+# Bitrates in kbit/s by [MPEG-1][layer] and [MPEG-2/2.5][layer], index 1-14
+MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# How far past the tags to look for the first frame
+MP3_SYNC_SEARCH_BYTES = 64 * 1024
+# Bytes read at a time while walking frame headers
+MP3_SCAN_CHUNK_BYTES = 256 * 1024
+# Share of the audio bytes the frame walk must cover; less means it lost sync
+MP3_MIN_COVERAGE = 0.95
+
+FFMPEG_DURATION_PATTERN = re.compile(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+_cache_lock = threading.Lock()
+_durations = OrderedDict()
+
+
+class AudioProbeError(Exception):
+    pass
+
+
+def parse_mp3_header(header):
+    """
+    Decode a 4-byte MPEG audio frame header.
+
+    Returns:
+        Optional[Tuple[int, int, int, int, bool, bool]]: Bitrate (bit/s),
+        sample rate, samples per frame, frame length in bytes, whether the
+        stream is MPEG-1 and whether it is mono; None if ``header`` isn't a
+        valid frame header.
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 1
+    mono = header[3] >> 6 == 3
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        frame_length = samples // 8 * bitrate // sample_rate + padding
+    return bitrate, sample_rate, samples, frame_length, mpeg1, mono
+
+
+def count_mp3_samples(f, start, end):
+    """
+    Walk the frame headers from ``start`` to ``end``, hopping from one header to the next.
+
+    Returns:
+        Tuple[int, int]: Samples in the frames found and the bytes they
+        span; the walk stops at the first byte that isn't a frame header.
+    """
+    samples = 0
+    position = start
+    buffer, buffer_start = b"", start
+    while position + 4 <= end:
+        if position + 4 > buffer_start + len(buffer):
+            f.seek(position)
+            buffer, buffer_start = f.read(MP3_SCAN_CHUNK_BYTES), position
+        frame = parse_mp3_header(buffer[position - buffer_start:position - buffer_start + 4])
+        if frame is None:
+            break
+        samples += frame[2]
+        position += frame[3]
+    return samples, min(position, end) - start
+
+
+def mp3_duration(f, size):
+    header = f.read(10)
+    audio_start = 0
+    if header[:3] == b"ID3":
+        # Sync-safe tag size, plus a footer if the flag says so
+        tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        audio_start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+
+    f.seek(audio_start)
+    data = f.read(MP3_SYNC_SEARCH_BYTES)
+    for offset in range(len(data) - 3):
+        if data[offset] != 0xFF:
+            continue
+        frame = parse_mp3_header(data[offset:offset + 4])
+        if frame is None:
+            continue
+        bitrate, sample_rate, samples, frame_length, mpeg1, mono = frame
+        # Require the next frame to line up, so stray 0xFF bytes aren't taken for a header
+        next_offset = offset + frame_length
+        if next_offset + 4 <= len(data) and parse_mp3_header(data[next_offset:next_offset + 4]) is None:
+            continue
+        break
+    else:
+        return None
+
+    # A Xing/Info or VBRI header in the first frame gives the exact frame count
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+            return frames * samples / sample_rate
+    vbri = offset + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+        return frames * samples / sample_rate
+
+    # No frame count, so count the frames; the first frame's bitrate says nothing about a VBR file
+    end = size
+    f.seek(max(size - 128, 0))
+    if f.read(3) == b"TAG":
+        end -= 128
+    samples, scanned = count_mp3_samples(f, audio_start + offset, end)
+    if scanned < (end - audio_start - offset) * MP3_MIN_COVERAGE:
+        # Junk between frames; leave it to ffmpeg
+        return None
+    return samples / sample_rate
+
+
+def wav_duration(f, size):
+    riff = f.read(12)
+    if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        return None
+    byte_rate = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            byte_rate = struct.unpack("<I", fmt[8:12])[0]
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # Streamed WAVs leave the size unset; the data runs to the end
+            data_size = min(chunk_size, size - f.tell())
+            return data_size / byte_rate
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def read_box_header(f, end):
+    start = f.tell()
+    if start + 8 > end:
+        return None
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    box_size, box_type = struct.unpack(">I4s", header)
+    header_size = 8
+    if box_size == 1:
+        box_size = struct.unpack(">Q", f.read(8))[0]
+        header_size = 16
+    elif box_size == 0:
+        box_size = end - start
+    if box_size < header_size:
+        return None
+    return box_type, start, start + box_size, start + header_size
+
+
+def mp4_duration(f, size):
+    # Walk the top-level boxes to moov, then its children to mvhd
+    end = size
+    while True:
+        box = read_box_header(f, end)
+        if box is None:
+            return None
+        box_type, _, box_end, _ = box
+        if box_type == b"moov":
+            end = box_end
+            continue
+        if box_type == b"mvhd":
+            version = f.read(1)[0]
+            f.read(3)
+            if version == 1:
+                _, _, timescale, duration = struct.unpack(">QQIQ", f.read(28))
+            else:
+                _, _, timescale, duration = struct.unpack(">IIII", f.read(16))
+            return duration / timescale if timescale else None
+        f.seek(box_end)
+
+
+def ffmpeg_duration(path):
+    """
+    Ask ffmpeg for the duration; one process, no decoding.
+    """
+    result = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-i", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    match = FFMPEG_DURATION_PATTERN.search(result.stderr)
+    if match is None:
+        raise AudioProbeError(f"Could not read the duration of {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def header_duration(path):
+    """
+    Read the duration from the MP3, WAV or MP4/M4A headers, without decoding.
+
+    Returns:
+        Optional[float]: Duration in seconds, or None for other formats.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        magic = f.read(12)
+        f.seek(0)
+        try:
+            if magic[:4] == b"RIFF":
+                return wav_duration(f, size)
+            if magic[4:8] == b"ftyp":
+                return mp4_duration(f, size)
+            if magic[:3] == b"ID3" or (len(magic) >= 2 and magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0):
+                return mp3_duration(f, size)
+        except (struct.error, IndexError, ZeroDivisionError):
+            return None
+    return None
+
+
+def probe_duration(path):
+    duration = header_duration(path)
+    if duration is None or duration <= 0:
+        duration = ffmpeg_duration(path)
+    return duration
+
+
+def probe_durations(paths):
+    """
+    Durations in seconds of audio files, in order.
+
+    Files are identified by content hash, so identical uploads are probed
+    once and repeated jobs are answered from memory.
+    """
+    durations = []
+    for path in paths:
+        digest = digest_file(path)
+        with _cache_lock:
+            duration = _durations.get(digest)
+            if duration is not None:
+                _durations.move_to_end(digest)
+        if duration is None:
+            duration = probe_duration(path)
+            with _cache_lock:
+                _durations[digest] = duration
+                if len(_durations) > AUDIO_PROBE_CACHE_SIZE:
+                    _durations.popitem(last=False)
+        durations.append(duration)
+    return durations
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import time
+from difflib import SequenceMatcher
+
+from pdf_text import BACKENDS, InvalidPDFError, get_backend
+
+
+def normalize(text):
+    # Backends differ in line endings and runs of whitespace, not worth counting
+    return " ".join(text.split())
+
+
+def page_agreement(reference_pages, pages):
+    """
+    Character-level similarity of two extractions, weighted by page length.
+    """
+    matched = 0
+    total = 0
+    for reference, text in zip(reference_pages, pages):
+        reference, text = normalize(reference), normalize(text)
+        length = max(len(reference), len(text))
+        if length == 0:
+            continue
+        matched += SequenceMatcher(None, reference, text, autojunk=False).ratio() * length
+        total += length
+    return matched / total if total else 1.0
+
+
+def extract_all(backend, pdf_path):
+    start = time.perf_counter()
+    page_count = backend.page_count(pdf_path)
+    pages = list(backend.iter_texts(pdf_path, 0, page_count))
+    return pages, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text extraction backends on a folder of PDFs.")
+    parser.add_argument("in_folder", help="Folder with PDF files")
+    parser.add_argument("--backends", type=str, default=",".join(BACKENDS), help="Comma separated backends to compare")
+    parser.add_argument("--reference", type=str, default="pypdf2", help="Backend the others are compared against")
+    parser.add_argument("--out_file", type=str, default=None, help="Optional JSON file for the full report")
+    args = parser.parse_args()
+
+    backend_names = args.backends.split(",")
+    if args.reference not in backend_names:
+        backend_names.insert(0, args.reference)
+    backends = [get_backend(name) for name in backend_names]
+
+    files = sorted(f for f in os.listdir(args.in_folder) if f.lower().endswith(".pdf"))
+    totals = {name: {"pages": 0, "seconds": 0.0, "characters": 0, "agreement": []} for name in backend_names}
+    per_file = {}
+
+    for fname in files:
+        pdf_path = os.path.join(args.in_folder, fname)
+        results = {}
+        try:
+            for backend in backends:
+                results[backend.name] = extract_all(backend, pdf_path)
+        except InvalidPDFError as e:
+            print(f"Skipping {fname}: {e}")
+            continue
+
+        reference_pages, _ = results[args.reference]
+        per_file[fname] = {}
+        for name, (pages, seconds) in results.items():
+            agreement = page_agreement(reference_pages, pages)
+            characters = sum(len(text) for text in pages)
+            per_file[fname][name] = {
+                "pages": len(pages),
+                "seconds": seconds,
+                "characters": characters,
+                "agreement": agreement,
+            }
+            totals[name]["pages"] += len(pages)
+            totals[name]["seconds"] += seconds
+            totals[name]["characters"] += characters
+            totals[name]["agreement"].append(agreement)
+
+    print(f"{len(per_file)} PDFs, agreement measured against {args.reference}")
+    print(f"{'backend':<12}{'pages':>8}{'seconds':>10}{'pages/sec':>12}{'chars':>12}{'agreement':>12}")
+    summary = {}
+    for name, total in totals.items():
+        pages_per_sec = total["pages"] / total["seconds"] if total["seconds"] else 0.0
+        agreement = sum(total["agreement"]) / len(total["agreement"]) if total["agreement"] else 0.0
+        summary[name] = {
+            "pages": total["pages"],
+            "seconds": total["seconds"],
+            "pages_per_sec": pages_per_sec,
+            "characters": total["characters"],
+            "agreement": agreement,
+        }
+        print(f"{name:<12}{total['pages']:>8}{total['seconds']:>10.2f}{pages_per_sec:>12.1f}{total['characters']:>12}{agreement:>12.3f}")
+
+    if args.out_file:
+        with open(args.out_file, "w") as f:
+            json.dump({"reference": args.reference, "summary": summary, "files": per_file}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
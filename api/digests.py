@@ -0,0 +1,15 @@
+import hashlib
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def digest_bytes(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+
+def digest_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
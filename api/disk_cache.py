@@ -0,0 +1,132 @@
+import os
+import threading
+from typing import List
+
+# Eviction frees the directory down to this fraction of its budget, so the
+# rescan it needs is paid once per many puts rather than on every put
+DISK_CACHE_LOW_WATER = float(os.getenv("DISK_CACHE_LOW_WATER", "0.9"))
+
+
+def temp_path(path):
+    # Unique per process and thread, so concurrent writers never share one
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_file(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_atomic(path, data: bytes):
+    """
+    Write ``data`` to ``path`` so readers see the old file or the new one, never part of it.
+    """
+    tmp_path = temp_path(path)
+    write_file(tmp_path, data)
+    os.replace(tmp_path, path)
+
+
+class DiskLRU:
+    """
+    Byte budget for a cache directory, evicting least recently used entries.
+
+    Entries are the files ending in one of ``suffixes``, and an entry's
+    mtime is its last use, so readers ``touch`` it. The directory is
+    counted once, on the first write, and its size is tracked from then on;
+    a put only rescans the directory when it goes over ``max_bytes``. The
+    rescan also picks up entries written by other processes sharing the
+    directory. Caches with other entry layouts override ``entries`` and
+    ``remove``.
+    """
+
+    def __init__(self, directory, max_bytes, suffixes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffixes = tuple(suffixes)
+        self.lock = threading.Lock()
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def entries(self):
+        """
+        Returns:
+            list: (last used, size, name) of every entry.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffixes):
+                continue
+            try:
+                stat = os.stat(self.path(name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def remove(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def touch(self, name):
+        # Reads count as use for eviction
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def grew(self, name, size) -> List[str]:
+        """
+        Account for entry ``name`` growing by ``size`` bytes, evicting others if over budget.
+
+        Returns:
+            List[str]: Names of the evicted entries; ``name`` itself is kept.
+        """
+        with self.lock:
+            if self.size is None:
+                self.size = sum(entry_size for _, entry_size, _ in self.entries())
+            else:
+                self.size += size
+            if self.size <= self.max_bytes:
+                return []
+            return self._evict(keep=name)
+
+    def add(self, name, write) -> List[str]:
+        """
+        Create or replace entry ``name`` atomically, by calling ``write`` with a temporary path.
+
+        Returns:
+            List[str]: Names of the entries evicted to make room.
+        """
+        path = self.path(name)
+        tmp_path = temp_path(path)
+        write(tmp_path)
+        size = os.path.getsize(tmp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        return self.grew(name, size - replaced)
+
+    def put(self, name, data: bytes) -> List[str]:
+        return self.add(name, lambda tmp_path: write_file(tmp_path, data))
+
+    def _evict(self, keep=None):
+        entries = self.entries()
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * DISK_CACHE_LOW_WATER
+        evicted = []
+        for _, size, name in sorted(entries):
+            if self.size <= target:
+                break
+            if name == keep:
+                continue
+            self.remove(name)
+            self.size -= size
+            evicted.append(name)
+        return evicted
@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+from digests import digest_bytes, digest_file
+from disk_cache import DiskLRU, write_atomic
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(".cache", "pdf_text"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+
+def dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, files in os.walk(path)
+        for file_name in files
+    )
+
+
+class EntryLRU(DiskLRU):
+    # Entries are directories, last used when their entry.json was
+    def __init__(self, directory, max_bytes):
+        super().__init__(directory, max_bytes, ())
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            try:
+                last_used = os.stat(os.path.join(self.path(name), "entry.json")).st_mtime
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            entries.append((last_used, dir_size(self.path(name)), name))
+        return entries
+
+    def remove(self, name):
+        shutil.rmtree(self.path(name), ignore_errors=True)
+
+    def touch(self, name):
+        super().touch(os.path.join(name, "entry.json"))
+
+
+class ExtractionCache:
+    """
+    On-disk LRU cache of PDF extraction results keyed by content hash.
+
+    An entry is identified by the SHA-256 of the PDF bytes and the name of
+    the extraction backend. It holds the document's page count, the text of
+    every page extracted so far, backend-specific ``meta`` (JSON) and
+    optional binary ``blobs``. Entries are evicted least recently used first
+    once the directory grows past ``max_bytes``.
+
+    The class only depends on the standard library, so it can be handed to
+    ``marker.convert.convert_single_pdf(..., extraction_cache=cache)`` as well.
+    """
+
+    digest_bytes = staticmethod(digest_bytes)
+    digest_file = staticmethod(digest_file)
+
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.disk = EntryLRU(directory, max_bytes)
+
+    def entry_name(self, digest, backend):
+        safe_backend = re.sub(r"[^A-Za-z0-9_.-]", "_", backend)
+        return f"{digest}-{safe_backend}"
+
+    def entry_dir(self, digest, backend):
+        return self.disk.path(self.entry_name(digest, backend))
+
+    def get(self, digest, backend) -> Optional[Dict]:
+        """
+        Return the cached entry, with ``pages`` keyed by page number, or None.
+        """
+        entry_path = os.path.join(self.entry_dir(digest, backend), "entry.json")
+        with self.lock:
+            try:
+                with open(entry_path) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            self.disk.touch(self.entry_name(digest, backend))
+        entry["pages"] = {int(pnum): text for pnum, text in entry["pages"].items()}
+        return entry
+
+    def read_blob(self, digest, backend, name) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.entry_dir(digest, backend), "blobs", name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest, backend, page_count, pages: Dict[int, str], meta: Optional[Dict] = None, blobs: Optional[Dict[str, bytes]] = None):
+        """
+        Store extraction results, merging ``pages`` into any cached pages.
+        """
+        entry_dir = self.entry_dir(digest, backend)
+        with self.lock:
+            os.makedirs(entry_dir, exist_ok=True)
+            # Only this entry is measured, the rest of the directory's size is tracked
+            size_before = dir_size(entry_dir)
+            entry_path = os.path.join(entry_dir, "entry.json")
+            try:
+                with open(entry_path) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                entry = {"digest": digest, "backend": backend, "pages": {}, "meta": {}, "blobs": []}
+
+            entry["page_count"] = page_count
+            entry["pages"].update({str(pnum): text for pnum, text in pages.items()})
+            if meta is not None:
+                entry["meta"] = meta
+            if blobs:
+                blob_dir = os.path.join(entry_dir, "blobs")
+                os.makedirs(blob_dir, exist_ok=True)
+                for name, data in blobs.items():
+                    with open(os.path.join(blob_dir, name), "wb") as f:
+                        f.write(data)
+                entry["blobs"] = sorted(set(entry["blobs"]) | set(blobs))
+            entry["updated_at"] = time.time()
+
+            write_atomic(entry_path, json.dumps(entry).encode("utf-8"))
+
+            self.disk.grew(self.entry_name(digest, backend), dir_size(entry_dir) - size_before)
+
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,104 @@
+import math
+import os
+import threading
+
+from audio_probe import header_duration
+from video import run_ffmpeg
+
+PLAYLIST_NAME = "index.m3u8"
+
+
+def remux_to_ts(segment_path, output_path, offset):
+    """
+    Copy an MP4 segment into an MPEG-TS file starting at ``offset`` seconds.
+
+    Every slide segment is encoded on its own and starts at zero, so the
+    offset keeps timestamps increasing across the playlist.
+    """
+    run_ffmpeg([
+        "-i", segment_path,
+        "-c", "copy",
+        "-bsf:v", "h264_mp4toannexb",
+        "-output_ts_offset", f"{offset:.3f}",
+        "-avoid_negative_ts", "disabled",
+        "-f", "mpegts",
+        output_path,
+    ])
+    return output_path
+
+
+class HLSPublisher:
+    """
+    Publishes encoded slide segments as a growing HLS event playlist.
+
+    Segments may finish in any order; each is remuxed to MPEG-TS and added
+    to the playlist as soon as every segment before it is available, so
+    playback can start while later slides are still encoding. ``finish``
+    closes the playlist.
+    """
+
+    def __init__(self, directory, durations):
+        self.directory = directory
+        # Planned durations until a segment is published, then its real one
+        self.durations = list(durations)
+        self.planned = list(durations)
+        self.offset = 0.0
+        self.ready = {}
+        self.published = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.write_playlist(finished=False)
+
+    @property
+    def playlist_path(self):
+        return os.path.join(self.directory, PLAYLIST_NAME)
+
+    def segment_name(self, index):
+        return f"segment_{index:05d}.ts"
+
+    def add(self, index, segment_path):
+        """
+        Hand over the encoded MP4 segment of slide ``index``.
+        """
+        with self.lock:
+            self.ready[index] = segment_path
+            published = self.published
+            while published in self.ready:
+                segment_path = self.ready.pop(published)
+                # Video is encoded in whole frames, so a segment can run a
+                # little past its audio; chain the real lengths
+                duration = header_duration(segment_path) or self.durations[published]
+                remux_to_ts(segment_path, os.path.join(self.directory, self.segment_name(published)), self.offset)
+                self.durations[published] = duration
+                self.offset += duration
+                published += 1
+            if published != self.published:
+                self.published = published
+                self.write_playlist(finished=False)
+
+    def finish(self):
+        with self.lock:
+            self.write_playlist(finished=True)
+
+    def write_playlist(self, finished):
+        # Frame rounding stays well under half a second, so rounded EXTINF
+        # values never exceed this
+        target_duration = math.ceil(max(self.planned, default=1))
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for index in range(self.published):
+            lines.append(f"#EXTINF:{self.durations[index]:.3f},")
+            lines.append(self.segment_name(index))
+        if finished:
+            lines.append("#EXT-X-ENDLIST")
+
+        # Players poll the playlist, so never let them see a partial write
+        tmp_path = f"{self.playlist_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from digests import digest_bytes
+from disk_cache import DiskLRU, write_atomic
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(".cache", "images"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_FETCH_WORKERS = int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+# How long a cached image is used without revalidating it against the origin
+IMAGE_CACHE_FRESH_SECONDS = float(os.getenv("IMAGE_CACHE_FRESH_SECONDS", "300"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_session_lock = threading.Lock()
+_session = None
+_lru_lock = threading.Lock()
+_lru = None
+
+
+def get_session():
+    """
+    Shared keep-alive session, so slides from the same host reuse connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=IMAGE_FETCH_WORKERS, pool_maxsize=IMAGE_FETCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def cache_paths(url, max_size):
+    key = hashlib.sha256(f"{url}|{max_size[0]}x{max_size[1]}".encode("utf-8")).hexdigest()
+    base = os.path.join(IMAGE_CACHE_DIR, key)
+    return f"{base}.png", f"{base}.json"
+
+
+def read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def downscale(content: bytes, max_size):
+    img = Image.open(BytesIO(content))
+    img.thumbnail(max_size)
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class ImageLRU(DiskLRU):
+    # Entries are the downscaled PNGs; each one's metadata goes with it
+    def remove(self, name):
+        super().remove(name)
+        super().remove(f"{name[:-len('.png')]}.json")
+
+
+def get_lru():
+    """
+    The eviction tracker for IMAGE_CACHE_DIR, rebuilt if the cache settings change.
+    """
+    global _lru
+    with _lru_lock:
+        if _lru is None or (_lru.directory, _lru.max_bytes) != (IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES):
+            _lru = ImageLRU(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, (".png",))
+        return _lru
+
+
+def resolve_image(url, max_size):
+    """
+    Bring the cached, downscaled copy of a remote image up to date.
+
+    The image is fetched on a miss. A stale entry is revalidated with its
+    ETag/Last-Modified, and reused if the origin answers 304 or can't be
+    reached.
+
+    Args:
+        url (str): Image URL.
+        max_size (tuple): Bounding (width, height) the image is drawn into.
+
+    Returns:
+        str: SHA-256 of the cached image, which changes whenever the origin's image does.
+    """
+    lru = get_lru()
+    image_path, meta_path = cache_paths(url, max_size)
+    meta = read_meta(meta_path) if os.path.exists(image_path) else None
+
+    if meta is None or time.time() - meta["fetched_at"] > IMAGE_CACHE_FRESH_SECONDS:
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = get_session().get(url, headers=headers, timeout=IMAGE_FETCH_TIMEOUT)
+            if response.status_code != 304:
+                response.raise_for_status()
+                image = downscale(response.content, max_size)
+                lru.put(os.path.basename(image_path), image)
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "digest": digest_bytes(image),
+                }
+            meta["fetched_at"] = time.time()
+            write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        except requests.RequestException:
+            if meta is None:
+                raise
+            print(f"Could not revalidate {url}, using cached copy")
+
+    if not meta.get("digest"):
+        # Entries from before digests were recorded
+        with open(image_path, "rb") as f:
+            meta["digest"] = digest_bytes(f.read())
+    lru.touch(os.path.basename(image_path))
+    return meta["digest"]
+
+
+def load_image(url, max_size):
+    """
+    Resolve a remote image and read its cached, downscaled copy.
+
+    Returns:
+        bytes: The PNG the slide is drawn with; its SHA-256 is the image digest.
+    """
+    image_path, _ = cache_paths(url, max_size)
+    for attempt in range(2):
+        resolve_image(url, max_size)
+        try:
+            with open(image_path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted between resolving and reading; fetch it again
+            if attempt:
+                raise
+
+
+def fetch_image(url, max_size):
+    """
+    Fetch a remote image downscaled to fit ``max_size``, through the cache.
+
+    Returns:
+        Image.Image: The downscaled image.
+    """
+    img = Image.open(BytesIO(load_image(url, max_size)))
+    img.load()
+    return img
+
+
+def load_images(urls, max_size, workers=IMAGE_FETCH_WORKERS):
+    """
+    Load several image URLs concurrently.
+
+    Failures are logged and map to None, and the slide is drawn without
+    its image.
+
+    Returns:
+        dict: The cached PNG bytes of every URL, or None if it couldn't be fetched.
+    """
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+
+    def load(url):
+        try:
+            return load_image(url, max_size)
+        except Exception as e:
+            print(f"Error fetching image {url}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as executor:
+        return dict(zip(urls, executor.map(load, urls)))
@@ -1,25 +1,69 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
-from PIL import Image, ImageDraw, ImageFont
-import markdown
-from bs4 import BeautifulSoup
-import requests
 from io import BytesIO
 import base64
 import os
-import PyPDF2
 import uvicorn
-from moviepy.editor import ImageClip, AudioFileClip, concatenate_videoclips
 import json
 import uuid
-import shutil
+import zipfile
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+
+from audio_probe import probe_durations
+from digests import digest_bytes
+from hls import PLAYLIST_NAME, HLSPublisher
+from jobs import job_queue, QueueFullError
+from pdf_text import (
+    InvalidPDFError,
+    PageRangeError,
+    UnknownBackendError,
+    extract_pages,
+    open_page_stream,
+    shutdown_pool as shutdown_pdf_pool,
+)
+from responses import CachingStaticFiles, negotiate_media_type
+from retention import RetentionManager
+from segment_cache import segment_cache
+from slides import (
+    IMAGE_MEDIA_TYPES,
+    UnsupportedFormatError,
+    image_save_options,
+    render_slide,
+    render_slides,
+)
+from slides import shutdown_pool as shutdown_slide_pool
+from uploads import UploadBudget, UploadLimitMiddleware, UploadTooLargeError, spool_upload
+from video import encode_video
+from workspace import Workspace
+
+# Published videos live in the static folder
+STATIC_FOLDER = "static"
+if not os.path.exists(STATIC_FOLDER):
+    os.makedirs(STATIC_FOLDER)
+
+retention = RetentionManager(STATIC_FOLDER)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    retention.start()
+    yield
+    retention.stop()
+    shutdown_pdf_pool()
+    shutdown_slide_pool()
+
 
-app = FastAPI(docs_url="/api/docs", openapi_url="/api/openapi.json")
+app = FastAPI(docs_url="/api/docs", openapi_url="/api/openapi.json", lifespan=lifespan)
 
+# Added before CORS so that 413 responses still carry CORS headers
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,293 +72,579 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static folder
-STATIC_FOLDER = "static"
-if not os.path.exists(STATIC_FOLDER):
-    os.makedirs(STATIC_FOLDER)
-
-app.mount("/static", StaticFiles(directory=STATIC_FOLDER), name="static")
+static_files = CachingStaticFiles(directory=STATIC_FOLDER, on_access=retention.touch)
+app.mount("/static", static_files, name="static")
 
 class SlideRequest(BaseModel):
     title: str
     content: str
     image_url: Optional[str] = None
     image_subtitle: Optional[str] = None
+    format: Optional[str] = None  # "png", "webp" or "jpeg"
+    quality: Optional[int] = None
+    compress_level: Optional[int] = None
 
 
 @app.post("/api/create_slide")
-async def create_slide_endpoint(slide_request: SlideRequest):
+async def create_slide_endpoint(slide_request: SlideRequest, request: Request):
+    """
+    Render a single slide.
+
+    The response format is negotiated: when the ``Accept`` header names an
+    image type the slide is returned as raw image bytes, otherwise it is
+    base64-encoded in JSON as before. ``format`` in the body overrides the
+    negotiated type, and ``quality`` (JPEG/WebP) and ``compress_level``
+    (PNG) tune the encoder.
+
+    Returns:
+        Response or dict: The slide image, or ``{"slide_image", "media_type"}``.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept"), list(IMAGE_MEDIA_TYPES.values()))
+    image_format = slide_request.format or (media_type.split("/")[1] if media_type else "png")
     try:
-        slide = create_slide(
+        save_options = image_save_options(image_format, slide_request.quality, slide_request.compress_level)
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        image = await run_in_threadpool(
+            render_slide,
             slide_request.title,
             slide_request.content,
             slide_request.image_url,
             slide_request.image_subtitle,
+            save_options=save_options,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if media_type is not None:
+        return Response(
+            content=image,
+            media_type=IMAGE_MEDIA_TYPES[image_format],
+            headers={"Vary": "Accept"},
         )
 
-        # Convert the slide to base64
-        buffered = BytesIO()
-        slide.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+    # Convert the slide to base64
+    img_str = base64.b64encode(image).decode()
+    return JSONResponse(
+        {"slide_image": img_str, "media_type": IMAGE_MEDIA_TYPES[image_format]},
+        headers={"Vary": "Accept"},
+    )
+
+
+class SlideBatchRequest(BaseModel):
+    slides: List[SlideRequest]
+    output: str = "urls"  # "urls", "zip" or "json"
+
+
+MAX_BATCH_SLIDES = int(os.getenv("MAX_BATCH_SLIDES", "100"))
+SLIDES_FOLDER = os.path.join(STATIC_FOLDER, "slides")
 
-        return {"slide_image": img_str}
+
+def publish_slide(png: bytes):
+    """
+    Write a slide PNG into the static store under its content hash.
+
+    Returns:
+        str: URL of the published slide.
+    """
+    filename = f"{digest_bytes(png)}.png"
+    path = os.path.join(SLIDES_FOLDER, filename)
+    rel = os.path.join("slides", filename)
+    # The hold also covers the tmp file, so a sweep can't remove it mid-write
+    with retention.hold(rel):
+        if not os.path.exists(path):
+            os.makedirs(SLIDES_FOLDER, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        retention.touch(rel)
+    return f"/static/slides/{filename}"
+
+
+def zip_slides(pngs):
+    buffered = BytesIO()
+    # PNGs are already compressed, so store them as-is
+    with zipfile.ZipFile(buffered, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, png in enumerate(pngs):
+            archive.writestr(f"slide_{index}.png", png)
+    return buffered.getvalue()
+
+
+@app.post("/api/create_slides")
+async def create_slides_endpoint(batch_request: SlideBatchRequest):
+    """
+    Render a whole deck in one request.
+
+    Slides are rendered in parallel in a process pool; cached slides are
+    reused.
+
+    Args:
+        batch_request (SlideBatchRequest): The slides and the output format.
+            ``urls`` (default) publishes each slide to the static store and
+            returns their URLs, ``zip`` returns the PNGs in a zip archive
+            and ``json`` returns them base64-encoded like /api/create_slide.
+
+    Returns:
+        dict or Response: The rendered slides, in request order.
+    """
+    if batch_request.output not in ("urls", "zip", "json"):
+        raise HTTPException(status_code=400, detail="output must be one of urls, zip or json.")
+    if len(batch_request.slides) > MAX_BATCH_SLIDES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SLIDES} slides per request.")
+
+    try:
+        pngs = await run_in_threadpool(render_slides, [
+            (slide.title, slide.content, slide.image_url, slide.image_subtitle)
+            for slide in batch_request.slides
+        ])
+
+        if batch_request.output == "zip":
+            archive = await run_in_threadpool(zip_slides, pngs)
+            return Response(
+                content=archive,
+                media_type="application/zip",
+                headers={"Content-Disposition": 'attachment; filename="slides.zip"'},
+            )
+        if batch_request.output == "json":
+            return {"slide_images": [base64.b64encode(png).decode() for png in pngs]}
+
+        urls = await run_in_threadpool(lambda: [publish_slide(png) for png in pngs])
+        return {"slide_urls": urls}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 class PDFBase64Request(BaseModel):
     pdf_base64: str
+    start_page: Optional[int] = None
+    max_pages: Optional[int] = None
+    stream: bool = False
+    backend: Optional[str] = None
+
+
+def extract_pdf_text_from_file(pdf_path, start_page=None, max_pages=None, digest=None, backend=None):
+    """
+    Extract text from a PDF on disk, optionally limited to a page range.
+
+    Runs in a worker thread; pages are extracted in the PDF process pool, or
+    read from the extraction cache when ``digest`` has been seen before.
+    ``backend`` names the extraction backend (pypdf2 or pypdfium2).
+
+    Returns:
+        dict: Page counts, character count, a short sample and the full text.
+    """
+    try:
+        total_pages, pages, page_texts = extract_pages(
+            pdf_path, start_page, max_pages, digest=digest, backend_name=backend
+        )
+    except InvalidPDFError as e:
+        print(f"PDF error: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid PDF file: {str(e)}")
+    except (PageRangeError, UnknownBackendError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    all_text = "".join(page_texts)
+
+    # Prepare the response
+    return {
+        "total_pages": total_pages,
+        "start_page": pages.start,
+        "extracted_pages": len(pages),
+        "total_characters": len(all_text),
+        "extracted_text": all_text[
+            :1000
+        ],  # Return first 1000 characters as a sample
+        "full_text": all_text,
+    }
+
+
+def stream_pdf_text(workspace, pdf_path, start_page=None, max_pages=None, digest=None, backend=None):
+    """
+    Stream extraction results as NDJSON, one line per page as it is ready.
+
+    Page lines are ``{"type": "page", "page": n, "text": ...}`` in page order,
+    followed by a ``{"type": "summary", ...}`` line with the same counts as
+    the JSON response (without repeating the text). A failure after the
+    stream has started is reported as a final ``{"type": "error"}`` line.
+    The workspace is removed once the response is finished.
+    """
+    try:
+        total_pages, pages, page_texts = open_page_stream(
+            pdf_path, start_page, max_pages, digest=digest, backend_name=backend
+        )
+    except InvalidPDFError as e:
+        print(f"PDF error: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid PDF file: {str(e)}")
+    except (PageRangeError, UnknownBackendError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def lines():
+        total_characters = 0
+        try:
+            for pnum, text in page_texts:
+                total_characters += len(text)
+                yield json.dumps({"type": "page", "page": pnum, "text": text}) + "\n"
+            yield json.dumps({
+                "type": "summary",
+                "total_pages": total_pages,
+                "start_page": pages.start,
+                "extracted_pages": len(pages),
+                "total_characters": total_characters,
+            }) + "\n"
+        except Exception as e:
+            print(f"Unexpected error: {str(e)}")
+            yield json.dumps({"type": "error", "detail": f"Error processing PDF: {str(e)}"}) + "\n"
+        finally:
+            page_texts.close()
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(workspace.cleanup),
+    )
 
 
 @app.post("/api/extract_pdf_text")
 async def extract_pdf_text(request: PDFBase64Request):
+    """
+    Extract text from a base64-encoded PDF sent as JSON.
+
+    Kept for existing clients; /api/extract_pdf_text/upload avoids the
+    base64 overhead and the in-memory copies. Set ``stream`` to get NDJSON
+    page records as pages are extracted.
+    """
+    workspace = Workspace(prefix="pdf_")
+    streaming = False
     try:
-        # Decode the base64 PDF
+        # Decode the base64 PDF to disk so the extraction workers can open it
+        pdf_path = workspace.path("paper.pdf")
         pdf_content = base64.b64decode(request.pdf_base64)
+        digest = digest_bytes(pdf_content)
+        with open(pdf_path, "wb") as pdf_file:
+            pdf_file.write(pdf_content)
+        del pdf_content
+
+        if request.stream:
+            response = await run_in_threadpool(
+                stream_pdf_text, workspace, pdf_path, request.start_page, request.max_pages, digest, request.backend
+            )
+            streaming = True
+            return response
+        return await run_in_threadpool(
+            extract_pdf_text_from_file, pdf_path, request.start_page, request.max_pages, digest, request.backend
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    finally:
+        # A streaming response removes the workspace when it is done
+        if not streaming:
+            workspace.cleanup()
+
+
+@app.post("/api/extract_pdf_text/upload")
+async def extract_pdf_text_upload(
+    file: UploadFile = File(...),
+    start_page: Optional[int] = Form(None),
+    max_pages: Optional[int] = Form(None),
+    stream: bool = Form(False),
+    backend: Optional[str] = Form(None),
+):
+    """
+    Extract text from a PDF sent as a multipart file upload.
 
-        # Create a PDF reader object
-        pdf_file = BytesIO(pdf_content)
+    The upload is streamed to a temporary file in chunks and parsed from
+    disk, so the PDF is never held in memory as a whole.
 
-        try:
-            pdf_reader = PyPDF2.PdfReader(pdf_file, strict=False)
-        except PyPDF2.errors.PdfReadError as e:
-            print(f"PyPDF2 error: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Invalid PDF file: {str(e)}")
-
-        # Initialize an empty string to store all the text
-        all_text = ""
-
-        # Iterate through all pages and extract text
-        for page in pdf_reader.pages:
-            all_text += page.extract_text()
-
-        # Prepare the response
-        response = {
-            "total_pages": len(pdf_reader.pages),
-            "total_characters": len(all_text),
-            "extracted_text": all_text[
-                :1000
-            ],  # Return first 1000 characters as a sample
-            "full_text": all_text,
-        }
-
-        return response
+    Args:
+        file (UploadFile): The PDF file.
+        start_page (int, optional): First page to extract, zero-based.
+        max_pages (int, optional): Maximum number of pages to extract.
+        stream (bool): Return NDJSON page records as pages are extracted.
+        backend (str, optional): Extraction backend, pypdf2 or pypdfium2.
+
+    Returns:
+        dict: Same shape as /api/extract_pdf_text.
+    """
+    workspace = Workspace(prefix="pdf_")
+    streaming = False
+    try:
+        pdf_path = workspace.path("paper.pdf")
+        sha256 = hashlib.sha256()
+        await spool_upload(file, pdf_path, UploadBudget(), hasher=sha256)
+        digest = sha256.hexdigest()
+
+        if stream:
+            response = await run_in_threadpool(
+                stream_pdf_text, workspace, pdf_path, start_page, max_pages, digest, backend
+            )
+            streaming = True
+            return response
+        return await run_in_threadpool(
+            extract_pdf_text_from_file, pdf_path, start_page, max_pages, digest, backend
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    finally:
+        # A streaming response removes the workspace when it is done
+        if not streaming:
+            workspace.cleanup()
 
-@app.post("/api/create_slide")
-async def create_slide_endpoint(slide_request: SlideRequest):
-    try:
-        slide = create_slide(
-            slide_request.title,
-            slide_request.content,
-            slide_request.image_url,
-            slide_request.image_subtitle,
+def build_video(progress, job_id, workspace, slides_data, voiceover_paths, output="mp4"):
+    """
+    Render the slides and encode the lecture video. Runs on a job worker.
+
+    Args:
+        progress (Callable): Stage progress callback supplied by the job queue.
+        job_id (str): Id of the job, used to name the published video.
+        workspace (Workspace): The job's scratch directory, removed when done.
+        slides_data (list): Parsed slides JSON.
+        voiceover_paths (List[str]): Saved voiceover files, one per slide.
+        output (str): ``mp4``, or ``hls`` to also publish an HLS playlist
+            that grows as slides finish encoding.
+
+    Returns:
+        dict: Link to the generated video, and to the playlist for ``hls``.
+    """
+    video_filename = f"video_{job_id}.mp4"
+    hls_dirname = f"hls_{job_id}"
+    with workspace, retention.hold(video_filename, hls_dirname):
+        # Render every slide up front; figures are fetched concurrently and
+        # uncached slides are rasterized in parallel
+        progress("rendering_slides", 0, len(slides_data))
+        pngs = render_slides([
+            (slide["title"], slide["markdownContent"], slide.get("image_url"), slide.get("image_subtitle"))
+            for slide in slides_data
+        ])
+
+        image_paths = []
+        for index, (slide, png, _) in enumerate(zip(slides_data, pngs, voiceover_paths)):
+            print(f"Slide: {slide['title']}")
+            image_path = workspace.path(f"slide_{index}.png")
+            with open(image_path, "wb") as image_file:
+                image_file.write(png)
+            image_paths.append(image_path)
+            print(f"Saved slide image to {image_path}")
+
+        # Only the durations are needed, the segment encoder reads the audio itself
+        progress("probing_audio")
+        durations = probe_durations(voiceover_paths[:len(image_paths)])
+
+        publisher = None
+        if output == "hls":
+            publisher = HLSPublisher(os.path.join(STATIC_FOLDER, hls_dirname), durations)
+
+        # Encode one segment per changed slide and join them without re-encoding
+        progress("encoding", 0, len(image_paths))
+        encode_video(
+            image_paths,
+            voiceover_paths,
+            durations,
+            workspace.path("video.mp4"),
+            progress=lambda done: progress("encoding", done, len(image_paths)),
+            segment_cache=segment_cache,
+            on_segment=publisher.add if publisher else None,
         )
 
-        # Convert the slide to base64
-        buffered = BytesIO()
-        slide.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        workspace.promote("video.mp4", os.path.join(STATIC_FOLDER, video_filename))
+        retention.touch(video_filename)
+        result = {"video_url": f"/static/{video_filename}"}
+        if publisher is not None:
+            publisher.finish()
+            result["playlist_url"] = playlist_url(job_id)
+        return result
 
-        return {"slide_image": img_str}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
-def get_default_font(size):
-    return ImageFont.load_default().font_variant(size=size)
+def playlist_url(job_id):
+    return f"/static/hls_{job_id}/{PLAYLIST_NAME}"
 
-def create_slide(title, content, image_url=None, image_subtitle=None, width=800, height=600):
-    print(f"Creating slide: {title}")
+
+async def submit_video_job(slides: UploadFile, voiceovers: List[UploadFile], output="mp4"):
+    """
+    Save the uploads to a fresh workspace and queue a video job for them.
+
+    The uploads are streamed to disk in chunks before returning, since they
+    are closed once the request finishes. The job owns the workspace from
+    then on.
+    """
+    job_id = uuid.uuid4().hex
+    budget = UploadBudget()
+
+    workspace = Workspace(prefix=f"job_{job_id}_")
     try:
-        slide = Image.new('RGB', (width, height), color='white')
-        draw = ImageDraw.Draw(slide)
-
-        # Drastically increase font sizes
-        title_font_size = 60
-        content_font_size = 50
-        subtitle_font_size = 40
-
-        title_font = get_default_font(title_font_size)
-        content_font = get_default_font(content_font_size)
-        subtitle_font = get_default_font(subtitle_font_size)
-
-        # Draw title
-        title_width = width - 40
-        title_lines = wrap_text(title, title_font, title_width)
-        y_offset = 20
-        for line in title_lines:
-            draw.text((20, y_offset), line, font=title_font, fill="black")
-            y_offset += title_font_size + 5
-
-        # Parse and draw content
-        html = markdown.markdown(content)
-        soup = BeautifulSoup(html, "html.parser")
-
-        content_width = width - 40
-        y_offset += 20
-
-        for element in soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol"]):
-            if element.name == "p":
-                lines = wrap_text(element.text, content_font, content_width)
-                for line in lines:
-                    draw.text((20, y_offset), line, font=content_font, fill="black")
-                    y_offset += content_font_size + 5
-            elif element.name.startswith("h"):
-                header_size = content_font_size + 10
-                header_font = get_default_font(header_size)
-                header_lines = wrap_text(element.text, header_font, content_width)
-                for line in header_lines:
-                    draw.text((20, y_offset), line, font=header_font, fill="black")
-                    y_offset += header_size + 5
-            elif element.name in ["ul", "ol"]:
-                for li in element.find_all("li"):
-                    bullet_lines = wrap_text("• " + li.text, content_font, content_width - 20)
-                    for line in bullet_lines:
-                        draw.text((40, y_offset), line, font=content_font, fill="black")
-                        y_offset += content_font_size + 5
-
-        # Add image if provided (scaled down)
-        if image_url:
-            try:
-                response = requests.get(image_url)
-                img = Image.open(BytesIO(response.content))
-                img_width = width // 2
-                img_height = height // 2
-                img.thumbnail((img_width, img_height))
-                img_position = (width - img_width - 20, height - img_height - 20)
-                slide.paste(img, img_position)
-
-                if image_subtitle:
-                    subtitle_lines = wrap_text(image_subtitle, subtitle_font, img_width)
-                    subtitle_y = height - 30 - (len(subtitle_lines) * (subtitle_font_size + 5))
-                    for line in subtitle_lines:
-                        draw.text((width - img_width - 20, subtitle_y), line, font=subtitle_font, fill="black")
-                        subtitle_y += subtitle_font_size + 5
-            except Exception as e:
-                print(f"Error loading image: {e}")
-
-        return slide
-    except Exception as e:
-        print(f"Error in create_slide: {str(e)}")
-        raise
+        # Spool and parse the slides JSON
+        slides_path = workspace.path("slides.json")
+        await spool_upload(slides, slides_path, budget)
+        with open(slides_path, "rb") as slides_file:
+            slides_data = json.load(slides_file)
 
+        # Truncate slides_data to match the number of voiceovers
+        slides_data = slides_data[:len(voiceovers)]
+        print(f"Slides data: {slides_data}")
 
-def wrap_text(text, font, max_width):
-    words = text.split()
-    lines = []
-    current_line = words[0]
+        voiceover_paths = []
+        for index, voiceover in enumerate(voiceovers[:len(slides_data)]):
+            voiceover_path = workspace.path(f"voiceover_{index}.mp3")
+            await spool_upload(voiceover, voiceover_path, budget)
+            voiceover_paths.append(voiceover_path)
 
-    for word in words[1:]:
-        if font.getlength(current_line + " " + word) <= max_width:
-            current_line += " " + word
-        else:
-            lines.append(current_line)
-            current_line = word
+        return job_queue.submit(build_video, job_id, workspace, slides_data, voiceover_paths, output, job_id=job_id)
+    except BaseException:
+        workspace.cleanup()
+        raise
 
-    lines.append(current_line)
-    return lines
+
+def check_video_output(output):
+    if output not in ("mp4", "hls"):
+        raise HTTPException(status_code=400, detail="output must be mp4 or hls.")
 
 
 @app.post("/api/create_video")
 async def create_video(
     slides: UploadFile = File(...),
     voiceovers: List[UploadFile] = File(...),
+    output: str = Form("mp4"),
 ):
     """
     Create a video from slides JSON and corresponding MP3 voiceover files.
 
+    The work runs on the job queue; this endpoint waits for it to finish.
+    Use /api/jobs/create_video to get a job id back immediately instead.
+
     Args:
         slides (UploadFile): JSON file containing slide information.
         voiceovers (List[UploadFile]): List of MP3 files for each slide.
+        output (str): ``mp4`` (default) or ``hls`` to also publish an HLS playlist.
 
     Returns:
         dict: Link to the generated video.
     """
+    check_video_output(output)
     try:
-        # Read and parse the slides JSON
-        slides_content = await slides.read()
-        slides_data = json.loads(slides_content)
-        
-        # Truncate slides_data to match the number of voiceovers
-        slides_data = slides_data[:len(voiceovers)]
-
-        video_clips = []
-        print(f"Slides data: {slides_data}")
-        for index, (slide, voiceover) in enumerate(zip(slides_data, voiceovers)):
-            # Create slide image
-            slide_image = create_slide(
-                slide["title"],
-                slide["markdownContent"],
-                slide.get("image_url"),
-                slide.get("image_subtitle"),
-            )
-            print(f"Slide: {slide['title']}")
-            image_path = os.path.join(STATIC_FOLDER, f"slide_{index}.png")
-            slide_image.save(image_path)
-            print(f"Saved slide image to {image_path}")
-            # Save voiceover
-            voiceover_path = os.path.join(STATIC_FOLDER, f"voiceover_{index}.mp3")
-            with open(voiceover_path, "wb") as vo_file:
-                vo_file.write(await voiceover.read())
-
-            # Create video clip with image and audio
-            audio_clip = AudioFileClip(voiceover_path)
-            image_clip = ImageClip(image_path).set_duration(audio_clip.duration)
-            image_clip = image_clip.set_audio(audio_clip)
-
-            video_clips.append(image_clip)
-
-        # Concatenate all clips
-        final_clip = concatenate_videoclips(video_clips, method="compose")
-        video_filename = f"video_{uuid.uuid4().hex}.mp4"
-        video_path = os.path.join(STATIC_FOLDER, video_filename)
-        final_clip.write_videofile(video_path, fps=24)
-
-        # Clean up individual slide images and voiceovers
-        for index in range(len(slides_data)):
-            os.remove(os.path.join(STATIC_FOLDER, f"slide_{index}.png"))
-            os.remove(os.path.join(STATIC_FOLDER, f"voiceover_{index}.mp3"))
-
-        video_url = f"/static/{video_filename}"
-        return {"video_url": video_url}
+        job, future = await submit_video_job(slides, voiceovers, output)
+        return await asyncio.wrap_future(future)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error creating video: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/jobs/create_video", status_code=202)
+async def create_video_job(
+    slides: UploadFile = File(...),
+    voiceovers: List[UploadFile] = File(...),
+    output: str = Form("mp4"),
+):
+    """
+    Queue a video job and return its id without waiting for the encode.
+
+    Args:
+        slides (UploadFile): JSON file containing slide information.
+        voiceovers (List[UploadFile]): List of MP3 files for each slide.
+        output (str): ``mp4`` (default) or ``hls``. With ``hls`` the response
+            includes the playlist URL, which can be played while the video
+            is still encoding.
+
+    Returns:
+        dict: The job id and its initial status.
+    """
+    check_video_output(output)
+    try:
+        job, _ = await submit_video_job(slides, voiceovers, output)
+        if output == "hls":
+            return {"job_id": job.job_id, "status": job.status, "playlist_url": playlist_url(job.job_id)}
+        return {"job_id": job.job_id, "status": job.status}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"Error queueing video: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report the status and stage-level progress of a job.
+
+    Args:
+        job_id (str): Id returned by /api/jobs/create_video.
+
+    Returns:
+        dict: The job record; ``result.video_url`` is set once it is done.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.model_dump()
+
+
 @app.post("/api/clear_static")
 async def clear_static():
     """
-    Clear all files in the static folder.
+    Clear all files in the static folder that no running job still needs.
 
     Returns:
         dict: Confirmation message.
     """
     try:
-        shutil.rmtree(STATIC_FOLDER)
-        os.makedirs(STATIC_FOLDER)
-        return {"detail": "Static folder cleared successfully."}
+        removed = await run_in_threadpool(retention.sweep, True)
+        return {"detail": "Static folder cleared successfully.", "removed_files": len(removed)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/get_video/{filename}")
-async def get_video(filename: str):
+@app.get("/api/static_stats")
+async def static_stats():
+    """
+    Report disk usage and eviction counters for the static folder.
+
+    Returns:
+        dict: File count, bytes used, limits and eviction totals.
+    """
+    return await run_in_threadpool(retention.stats)
+
+
+@app.api_route("/api/get_video/{filename:path}", methods=["GET", "HEAD"])
+async def get_video(filename: str, request: Request):
     """
     Retrieve a video file from the static folder.
 
+    Supports byte ranges for seeking, ETag/Last-Modified validators and
+    conditional GET. HLS playlists (``hls_<job_id>/index.m3u8``) and their
+    segments are served from here too; playlists are sent with
+    ``Cache-Control: no-cache`` since they grow while the video encodes.
+
     Args:
-        filename (str): Name of the video file.
+        filename (str): Path of the video file within the static folder.
 
     Returns:
-        FileResponse: The requested video file.
+        Response: The requested video file, or 304 Not Modified.
     """
-    file_path = os.path.join(STATIC_FOLDER, filename)
-    if not os.path.exists(file_path):
+    file_path = os.path.normpath(os.path.join(STATIC_FOLDER, filename))
+    static_root = os.path.realpath(STATIC_FOLDER)
+    try:
+        # Absolute names, ".." and symlinks can all point outside the static folder
+        inside = os.path.commonpath([os.path.realpath(file_path), static_root]) == static_root
+    except ValueError:
+        inside = False
+    if not inside or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Video not found.")
-    return FileResponse(file_path, media_type="video/mp4")
+    return static_files.file_response(file_path, os.stat(file_path), request.scope)
 
 
 if __name__ == "__main__":
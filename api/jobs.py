@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+JOB_STORE = os.getenv("JOB_STORE", "memory")  # "memory" or "sqlite"
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+# How long the memory store keeps a finished job, and how many it keeps at most
+JOB_FINISHED_TTL_SECONDS = float(os.getenv("JOB_FINISHED_TTL_SECONDS", str(24 * 60 * 60)))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+FINISHED_STATUSES = ("done", "failed")
+
+
+class Job(BaseModel):
+    job_id: str
+    status: str = "queued"  # queued, running, done, failed
+    stage: str = "queued"
+    completed: int = 0
+    total: int = 0
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class MemoryJobStore:
+    """
+    Job records kept in process memory.
+
+    Queued and running jobs are kept until they finish. Finished jobs are
+    dropped oldest first once there are more than ``max_finished`` of them
+    or they are older than ``finished_ttl`` seconds, pruned on every save.
+    """
+
+    def __init__(self, finished_ttl=JOB_FINISHED_TTL_SECONDS, max_finished=JOB_MAX_FINISHED):
+        self.jobs = {}
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        # When each finished job finished, oldest first
+        self.finished = OrderedDict()
+        self.lock = threading.Lock()
+
+    def save(self, job: Job):
+        with self.lock:
+            self.jobs[job.job_id] = job.model_copy()
+            if job.status in FINISHED_STATUSES:
+                self.finished.pop(job.job_id, None)
+                self.finished[job.job_id] = job.updated_at
+            self._prune()
+
+    def _prune(self):
+        expires = time.time() - self.finished_ttl
+        while self.finished:
+            job_id, finished_at = next(iter(self.finished.items()))
+            if len(self.finished) <= self.max_finished and finished_at >= expires:
+                break
+            del self.finished[job_id]
+            del self.jobs[job_id]
+
+    def get(self, job_id) -> Optional[Job]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.model_copy() if job else None
+
+
+class SQLiteJobStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self.conn.commit()
+        self.fail_interrupted()
+
+    def fail_interrupted(self):
+        # Jobs that were queued or running when the process died will never finish
+        for (data,) in self.conn.execute("SELECT data FROM jobs").fetchall():
+            job = Job.model_validate_json(data)
+            if job.status in ("queued", "running"):
+                job.status = "failed"
+                job.error = "Interrupted by server restart"
+                job.updated_at = time.time()
+                self.save(job)
+
+    def save(self, job: Job):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data) VALUES (?, ?)",
+                (job.job_id, job.model_dump_json()),
+            )
+            self.conn.commit()
+
+    def get(self, job_id) -> Optional[Job]:
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded pool of background threads and records their progress.
+
+    A job function receives a ``progress(stage, completed, total)`` callback as
+    its first argument and returns a JSON-serializable result dict.
+    """
+
+    def __init__(self, store, workers=JOB_WORKERS, max_pending=JOB_QUEUE_SIZE):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, job_id=None) -> Tuple[Job, Future]:
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise QueueFullError("Job queue is full, try again later.")
+            self.pending += 1
+
+        now = time.time()
+        job = Job(job_id=job_id or uuid.uuid4().hex, created_at=now, updated_at=now)
+        self.store.save(job)
+        return job, self.executor.submit(self._run, job.model_copy(), fn, args)
+
+    def get(self, job_id) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def _update(self, job: Job, **fields):
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.updated_at = time.time()
+        self.store.save(job)
+
+    def _run(self, job: Job, fn: Callable, args):
+        def progress(stage, completed=0, total=0):
+            self._update(job, stage=stage, completed=completed, total=total)
+
+        try:
+            self._update(job, status="running", stage="starting")
+            result = fn(progress, *args)
+            self._update(job, status="done", stage="done", result=result)
+            return result
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {e}")
+            self._update(job, status="failed", error=str(e))
+            raise
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+
+def create_job_store():
+    if JOB_STORE == "sqlite":
+        return SQLiteJobStore(JOB_DB_PATH)
+    return MemoryJobStore()
+
+
+job_queue = JobQueue(create_job_store())
@@ -0,0 +1,262 @@
+import os
+import threading
+from typing import List, Optional
+
+import PyPDF2
+import pypdfium2 as pdfium
+
+from extraction_cache import extraction_cache
+from pools import new_pool
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+# Below this many pages the pool's startup and IPC cost more than they save
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+# Pages per pool task when streaming; smaller chunks get the first pages out sooner
+PDF_STREAM_CHUNK_PAGES = int(os.getenv("PDF_STREAM_CHUNK_PAGES", "2"))
+
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "pypdf2")
+
+_pool_lock = threading.Lock()
+_pool = None
+# pdfium is not thread-safe and inline extraction runs on threadpool workers,
+# so every pdfium call in the process goes through this lock
+pdfium_lock = threading.Lock()
+
+
+class InvalidPDFError(Exception):
+    pass
+
+
+class PageRangeError(Exception):
+    pass
+
+
+class UnknownBackendError(Exception):
+    pass
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_pool(PDF_WORKERS)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def open_reader(pdf_path):
+    try:
+        return PyPDF2.PdfReader(pdf_path, strict=False)
+    except PyPDF2.errors.PdfReadError as e:
+        raise InvalidPDFError(str(e))
+
+
+class PyPDF2Backend:
+    """
+    Pure-Python extraction with PyPDF2.
+    """
+
+    name = "pypdf2"
+
+    def page_count(self, pdf_path):
+        return len(open_reader(pdf_path).pages)
+
+    def iter_texts(self, pdf_path, start, stop):
+        pdf_reader = open_reader(pdf_path)
+        for pnum in range(start, stop):
+            yield pdf_reader.pages[pnum].extract_text()
+
+
+class PdfiumBackend:
+    """
+    Native extraction with pdfium, the same library marker uses.
+    """
+
+    name = "pypdfium2"
+
+    def open(self, pdf_path):
+        try:
+            with pdfium_lock:
+                return pdfium.PdfDocument(pdf_path)
+        except pdfium.PdfiumError as e:
+            raise InvalidPDFError(str(e))
+
+    def page_count(self, pdf_path):
+        doc = self.open(pdf_path)
+        with pdfium_lock:
+            try:
+                return len(doc)
+            finally:
+                doc.close()
+
+    def page_text(self, doc, pnum):
+        with pdfium_lock:
+            page = doc[pnum]
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_bounded()
+            finally:
+                text_page.close()
+                page.close()
+
+    def iter_texts(self, pdf_path, start, stop):
+        # The lock is taken per page, never across a yield, so a slow
+        # consumer doesn't stall other requests
+        doc = self.open(pdf_path)
+        try:
+            for pnum in range(start, stop):
+                yield self.page_text(doc, pnum)
+        finally:
+            with pdfium_lock:
+                doc.close()
+
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend(), PdfiumBackend())}
+
+
+def get_backend(name: Optional[str] = None):
+    name = name or PDF_TEXT_BACKEND
+    if name not in BACKENDS:
+        raise UnknownBackendError(f"Unknown PDF text backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def page_range(total_pages, start_page: Optional[int] = None, max_pages: Optional[int] = None):
+    start_page = start_page or 0
+    if start_page < 0 or (total_pages and start_page >= total_pages):
+        raise PageRangeError(f"start_page must be between 0 and {total_pages - 1}")
+    if max_pages is not None and max_pages < 1:
+        raise PageRangeError("max_pages must be at least 1")
+
+    end_page = total_pages if max_pages is None else min(total_pages, start_page + max_pages)
+    return range(start_page, end_page)
+
+
+def extract_page_texts(pdf_path, start, stop, backend_name) -> List[str]:
+    """
+    Extract the text of pages ``start`` to ``stop`` (exclusive), one string per page.
+
+    Runs in pool workers, so it takes a path and a backend name and opens
+    its own document.
+    """
+    return list(get_backend(backend_name).iter_texts(pdf_path, start, stop))
+
+
+def chunk_ranges(pages: range, chunk_pages):
+    for start in range(pages.start, pages.stop, chunk_pages):
+        yield start, min(start + chunk_pages, pages.stop)
+
+
+def iter_page_texts(pdf_path, pages: range, chunk_pages, backend, workers=PDF_WORKERS):
+    """
+    Yield ``(page_number, text)`` in page order as soon as each chunk is done.
+
+    Chunks of ``chunk_pages`` pages are extracted in the process pool; small
+    ranges are extracted inline.
+    """
+    if workers <= 1 or len(pages) < PDF_PARALLEL_MIN_PAGES:
+        yield from zip(pages, backend.iter_texts(pdf_path, pages.start, pages.stop))
+        return
+
+    chunks = list(chunk_ranges(pages, max(1, chunk_pages)))
+    futures = [get_pool().submit(extract_page_texts, pdf_path, start, stop, backend.name) for start, stop in chunks]
+    try:
+        for (start, _), future in zip(chunks, futures):
+            for offset, text in enumerate(future.result()):
+                yield start + offset, text
+    finally:
+        # Stop queued work if the consumer goes away early
+        for future in futures:
+            future.cancel()
+
+
+def cached_pages(digest, backend, start_page, max_pages):
+    """
+    Look up a page range in the extraction cache without opening the PDF.
+
+    Returns:
+        Optional[Tuple[int, range, List[str]]]: Same as ``extract_pages`` on a
+        hit, None otherwise.
+    """
+    entry = extraction_cache.get(digest, backend.name) if digest else None
+    if entry is None:
+        return None
+    pages = page_range(entry["page_count"], start_page, max_pages)
+    if any(pnum not in entry["pages"] for pnum in pages):
+        return None
+    return entry["page_count"], pages, [entry["pages"][pnum] for pnum in pages]
+
+
+def cache_pages(digest, backend, total_pages, pages: range, page_texts):
+    if digest:
+        extraction_cache.put(digest, backend.name, total_pages, dict(zip(pages, page_texts)))
+
+
+def iter_and_cache(digest, backend, total_pages, pages: range, page_iter):
+    """
+    Pass pages through, caching them once the whole range has been seen.
+    """
+    page_texts = []
+    for pnum, text in page_iter:
+        page_texts.append(text)
+        yield pnum, text
+    cache_pages(digest, backend, total_pages, pages, page_texts)
+
+
+def open_page_stream(pdf_path, start_page: Optional[int] = None, max_pages: Optional[int] = None, chunk_pages=PDF_STREAM_CHUNK_PAGES, digest=None, backend_name=None):
+    """
+    Validate the PDF and page range, then return a lazy page iterator.
+
+    Errors about the file or the range are raised here, before anything is
+    streamed. With ``digest`` (the SHA-256 of the PDF) pages are served from
+    and added to the extraction cache. ``backend_name`` picks the extraction
+    backend, defaulting to PDF_TEXT_BACKEND.
+
+    Returns:
+        Tuple[int, range, Iterator]: Total pages in the document, the pages
+        that will be extracted and an iterator of ``(page_number, text)``.
+    """
+    backend = get_backend(backend_name)
+    cached = cached_pages(digest, backend, start_page, max_pages)
+    if cached is not None:
+        total_pages, pages, page_texts = cached
+        return total_pages, pages, (page for page in zip(pages, page_texts))
+
+    total_pages = backend.page_count(pdf_path)
+    pages = page_range(total_pages, start_page, max_pages)
+    page_iter = iter_page_texts(pdf_path, pages, chunk_pages, backend)
+    return total_pages, pages, iter_and_cache(digest, backend, total_pages, pages, page_iter)
+
+
+def extract_pages(pdf_path, start_page: Optional[int] = None, max_pages: Optional[int] = None, workers=PDF_WORKERS, digest=None, backend_name=None):
+    """
+    Extract per-page text from a PDF on disk.
+
+    Large page ranges are split into one contiguous chunk per worker and
+    extracted in a process pool, so the work uses every core. With
+    ``digest`` (the SHA-256 of the PDF) a cached result is returned without
+    parsing the PDF, and new results are cached. ``backend_name`` picks the
+    extraction backend, defaulting to PDF_TEXT_BACKEND.
+
+    Returns:
+        Tuple[int, range, List[str]]: Total pages in the document, the pages
+        extracted and their text.
+    """
+    backend = get_backend(backend_name)
+    cached = cached_pages(digest, backend, start_page, max_pages)
+    if cached is not None:
+        return cached
+
+    total_pages = backend.page_count(pdf_path)
+    pages = page_range(total_pages, start_page, max_pages)
+    chunk_pages = -(-len(pages) // max(1, workers))
+    page_texts = [text for _, text in iter_page_texts(pdf_path, pages, chunk_pages, backend, workers)]
+    cache_pages(digest, backend, total_pages, pages, page_texts)
+    return total_pages, pages, page_texts
@@ -0,0 +1,18 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_context():
+    """
+    Start method for the worker pools.
+
+    Pools are created lazily from request threads, so forking would copy
+    whatever locks, sessions and sockets other threads hold at that moment
+    into every worker. Workers are started from a clean process instead.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def new_pool(workers):
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=pool_context())
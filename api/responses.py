@@ -0,0 +1,82 @@
+import mimetypes
+import os
+
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+# Generated videos get a fresh name every time, so they never change in place
+STATIC_CACHE_CONTROL = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=31536000, immutable")
+# HLS playlists grow while a video encodes, so clients must revalidate them
+PLAYLIST_CACHE_CONTROL = "no-cache"
+# Not in every platform's mimetypes table, or mapped to something else
+MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".mp4": "video/mp4",
+}
+
+
+def guess_media_type(path):
+    extension = os.path.splitext(str(path))[1].lower()
+    return MEDIA_TYPES.get(extension) or mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+
+
+def cache_control_for(path):
+    return PLAYLIST_CACHE_CONTROL if str(path).endswith(".m3u8") else STATIC_CACHE_CONTROL
+
+
+def negotiate_media_type(accept, available):
+    """
+    Pick the best of ``available`` media types for an ``Accept`` header.
+
+    Only explicit types and ``type/*`` ranges count; a bare ``*/*`` (what
+    most HTTP clients send by default) matches nothing, so callers can fall
+    back to their historical response.
+
+    Returns:
+        Optional[str]: The preferred media type, or None.
+    """
+    best, best_q = None, 0.0
+    for item in (accept or "").split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_range = media_range.lower()
+        if media_range == "*/*":
+            continue
+        if media_range.endswith("/*"):
+            candidates = [media_type for media_type in available if media_type.startswith(media_range[:-1])]
+        else:
+            candidates = [media_range] if media_range in available else []
+        # Earlier entries win ties
+        if candidates and q > best_q:
+            best, best_q = candidates[0], q
+    return best
+
+
+class CachingStaticFiles(StaticFiles):
+    """
+    StaticFiles that adds Cache-Control and HLS media types to its responses.
+
+    Ranges, validators, conditional GET and HEAD are Starlette's.
+    ``on_access`` is called with the path of every file served.
+    """
+
+    def __init__(self, *args, on_access=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_access = on_access
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        if self.on_access and status_code == 200:
+            self.on_access(os.path.relpath(full_path, self.directory))
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["cache-control"] = cache_control_for(full_path)
+        if isinstance(response, FileResponse):
+            response.headers["content-type"] = guess_media_type(full_path)
+        return response
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))
+RETENTION_MAX_AGE_SECONDS = float(os.getenv("RETENTION_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "300"))
+
+
+class RetentionManager:
+    """
+    Keeps a published-files directory under a byte and age budget.
+
+    Files are ranked by last access, as reported through ``touch``, falling
+    back to their modification time. A sweep first drops files not accessed
+    within ``max_age`` and then evicts least recently used files until the
+    directory fits in ``max_bytes``. Files held by an active job via ``hold``,
+    inside a directory held that way, or being written next to a held path
+    as ``<path>.<token>.tmp``, are never removed.
+
+    The directory is scanned and files are removed without blocking
+    ``touch``; the lock is only taken per file, so a hold can't be granted
+    between the check and the removal.
+    """
+
+    def __init__(self, directory, max_bytes=RETENTION_MAX_BYTES, max_age=RETENTION_MAX_AGE_SECONDS, interval=RETENTION_INTERVAL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.accessed = {}
+        self.held = Counter()
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_sweep = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def relpath(self, path):
+        return os.path.relpath(os.path.join(self.directory, path), self.directory)
+
+    def touch(self, path):
+        # Called on the event loop for every request, so no lock; a single
+        # dict assignment is atomic
+        self.accessed[self.relpath(path)] = time.time()
+
+    @contextmanager
+    def hold(self, *paths):
+        """
+        Protect ``paths`` from eviction while the block runs.
+
+        A directory path protects everything below it, including files
+        created while it is held.
+        """
+        names = [self.relpath(path) for path in paths]
+        with self.lock:
+            self.held.update(names)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.held.subtract(names)
+                self.held += Counter()  # Drop names that are no longer held
+
+    def is_held(self, rel):
+        # In-progress writes are named "<path>.<token>.tmp"
+        if rel.endswith(".tmp"):
+            rel = rel[:-len(".tmp")].rsplit(".", 1)[0]
+        while rel:
+            if self.held[rel]:
+                return True
+            rel = os.path.dirname(rel)
+        return False
+
+    def scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                rel = os.path.relpath(path, self.directory)
+                last_access = self.accessed.get(rel, stat.st_mtime)
+                entries.append((last_access, stat.st_size, rel))
+        return entries
+
+    def remove(self, rel, size):
+        try:
+            os.remove(os.path.join(self.directory, rel))
+        except FileNotFoundError:
+            return False
+        self.accessed.pop(rel, None)
+        self.evicted_files += 1
+        self.evicted_bytes += size
+        return True
+
+    def sweep(self, clear=False):
+        """
+        Evict expired and least recently used files.
+
+        With ``clear`` every file that isn't held is removed.
+
+        Returns:
+            List[str]: Paths removed, relative to the directory.
+        """
+        now = time.time()
+        removed = []
+        entries = sorted(self.scan())
+        total = sum(size for _, size, _ in entries)
+        for last_access, size, rel in entries:
+            expired = now - last_access > self.max_age
+            if not (clear or expired or total > self.max_bytes):
+                continue
+            with self.lock:
+                if self.is_held(rel) or not self.remove(rel, size):
+                    continue
+            removed.append(rel)
+            total -= size
+        self.remove_empty_dirs()
+        self.last_sweep = now
+        return removed
+
+    def remove_empty_dirs(self):
+        for root, dirs, files in os.walk(self.directory, topdown=False):
+            if root == self.directory or dirs or files:
+                continue
+            with self.lock:
+                if self.is_held(os.path.relpath(root, self.directory)):
+                    continue
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+
+    def stats(self):
+        entries = self.scan()
+        with self.lock:
+            held_files = sum(1 for _, _, rel in entries if self.is_held(rel))
+            return {
+                "files": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age,
+                "held_files": held_files,
+                "evicted_files": self.evicted_files,
+                "evicted_bytes": self.evicted_bytes,
+                "last_sweep": self.last_sweep,
+            }
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"Retention evicted {len(removed)} files from {self.directory}")
+            except Exception as e:
+                print(f"Retention sweep failed: {e}")
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, name="retention", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
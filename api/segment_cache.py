@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import shutil
+
+from disk_cache import DiskLRU
+
+SEGMENT_CACHE_DIR = os.getenv("SEGMENT_CACHE_DIR", os.path.join(".cache", "segments"))
+SEGMENT_CACHE_MAX_BYTES = int(os.getenv("SEGMENT_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+
+
+def segment_key(image_digest, audio_digest, duration, encoder_settings):
+    """
+    Hash everything that affects an encoded slide segment.
+    """
+    payload = json.dumps([image_digest, audio_digest, f"{duration:.3f}", encoder_settings], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(source, destination):
+    # A hard link is free and survives the source being evicted
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class SegmentCache:
+    """
+    On-disk LRU cache of encoded per-slide MP4 segments, keyed by ``segment_key``.
+
+    Segments are linked in and out of the cache rather than copied where the
+    filesystem allows it, so a hit costs no I/O. Entries are evicted least
+    recently used first once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory=SEGMENT_CACHE_DIR, max_bytes=SEGMENT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.disk = DiskLRU(directory, max_bytes, (".mp4",))
+
+    def path(self, key):
+        return self.disk.path(f"{key}.mp4")
+
+    def get(self, key, destination):
+        """
+        Place the cached segment at ``destination``.
+
+        Returns:
+            bool: Whether the segment was cached.
+        """
+        # Held so the segment isn't evicted between linking and touching it
+        with self.disk.lock:
+            try:
+                link_or_copy(self.path(key), destination)
+            except FileNotFoundError:
+                return False
+            self.disk.touch(f"{key}.mp4")
+        return True
+
+    def put(self, key, source):
+        self.disk.add(f"{key}.mp4", lambda tmp_path: link_or_copy(source, tmp_path))
+
+segment_cache = SegmentCache()
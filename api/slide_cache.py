@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from disk_cache import DiskLRU
+
+SLIDE_CACHE_DIR = os.getenv("SLIDE_CACHE_DIR", os.path.join(".cache", "slides"))
+SLIDE_CACHE_MEMORY_BYTES = int(os.getenv("SLIDE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+SLIDE_CACHE_DISK_BYTES = int(os.getenv("SLIDE_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+SLIDE_CACHE_SUFFIXES = (".png", ".webp", ".jpeg")
+# Bump when a change to slide drawing should invalidate cached renders
+SLIDE_LAYOUT_VERSION = 4
+
+
+def slide_key(title, content, image_digest=None, image_subtitle=None, width=800, height=600, save_options=None):
+    """
+    Hash everything that affects a rendered slide's bytes.
+
+    ``image_digest`` is the content hash of the figure, so a slide changes
+    with its image rather than its URL. ``save_options`` are the Pillow save
+    arguments of the output image; the key ends in the matching file
+    extension.
+    """
+    save_options = save_options or {"format": "PNG"}
+    payload = json.dumps([SLIDE_LAYOUT_VERSION, title, content, image_digest, image_subtitle, width, height, save_options], sort_keys=True)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{digest}.{save_options['format'].lower()}"
+
+
+class SlideCache:
+    """
+    Two-level LRU cache of encoded slide images, keyed by ``slide_key``.
+
+    Recently used slides are kept in memory; everything is also written to
+    ``directory`` so a render survives restarts and is shared by workers.
+    Both levels evict least recently used entries once over their byte limit.
+    """
+
+    def __init__(self, directory=SLIDE_CACHE_DIR, memory_bytes=SLIDE_CACHE_MEMORY_BYTES, disk_bytes=SLIDE_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.disk = DiskLRU(directory, disk_bytes, SLIDE_CACHE_SUFFIXES)
+
+    def path(self, key):
+        return self.disk.path(key)
+
+    def get(self, key):
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                return data
+
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self.disk.touch(key)
+
+        with self.lock:
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data: bytes):
+        evicted = self.disk.put(key, data)
+        with self.lock:
+            self._remember(key, data)
+            for name in evicted:
+                self.memory_size -= len(self.memory.pop(name, b""))
+
+    def _remember(self, key, data):
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        if len(data) > self.memory_bytes:
+            return
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+
+slide_cache = SlideCache()
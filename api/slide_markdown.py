@@ -0,0 +1,120 @@
+from collections import namedtuple
+from typing import List
+
+from markdown_it import MarkdownIt
+
+# One line of laid-out text on a slide. ``kind`` is "heading", "paragraph"
+# or "bullet"; ``level`` is the heading level or the list nesting depth and
+# ``marker`` the bullet or number drawn in front of a list item.
+Block = namedtuple("Block", ["kind", "runs", "level", "marker"])
+# A piece of inline text; ``strong`` and ``em`` mark emphasis
+Run = namedtuple("Run", ["text", "strong", "em"])
+
+BULLET = "•"
+
+# CommonMark; the parser is stateless, so one instance serves every thread
+markdown_parser = MarkdownIt("commonmark")
+
+
+def inline_runs(children) -> List[Run]:
+    """
+    Turn the children of an inline token into styled runs.
+
+    Code spans, links and autolinks keep their text, line breaks become
+    spaces, and images and raw HTML are dropped.
+    """
+    runs = []
+    strong = em = 0
+
+    def add(piece):
+        if not piece:
+            return
+        if runs and runs[-1].strong == bool(strong) and runs[-1].em == bool(em):
+            runs[-1] = runs[-1]._replace(text=runs[-1].text + piece)
+        else:
+            runs.append(Run(piece, bool(strong), bool(em)))
+
+    for token in children or []:
+        if token.type in ("text", "code_inline"):
+            add(token.content)
+        elif token.type in ("softbreak", "hardbreak"):
+            add(" ")
+        elif token.type == "strong_open":
+            strong += 1
+        elif token.type == "strong_close":
+            strong -= 1
+        elif token.type == "em_open":
+            em += 1
+        elif token.type == "em_close":
+            em -= 1
+    return runs
+
+
+def code_blocks(content) -> List[Block]:
+    # Code has no inline markup; each non-blank line is drawn as its own paragraph
+    return [Block("paragraph", [Run(line.strip(), False, False)], 0, None) for line in content.splitlines() if line.strip()]
+
+
+def parse_markdown(content) -> List[Block]:
+    """
+    Turn slide markdown into layout blocks in reading order.
+
+    The blocks come from markdown-it's CommonMark token stream. Headings,
+    paragraphs, blockquotes (as plain paragraphs), fenced and indented code
+    (one paragraph per line) and bullet or numbered lists nested to any
+    depth are laid out; each list item becomes one block at its own depth,
+    with further paragraphs of the item as unmarked blocks below it.
+    Horizontal rules and raw HTML blocks are skipped.
+    """
+    blocks = []
+    # Next number of every open list, None for bullet lists, outermost first
+    lists = []
+    # Marker of the list item whose first block hasn't been seen yet
+    pending_marker = None
+
+    def add(kind, runs, level=0):
+        nonlocal pending_marker
+        if lists:
+            blocks.append(Block("bullet", runs, len(lists) - 1, pending_marker or ""))
+            pending_marker = None
+        else:
+            blocks.append(Block(kind, runs, level, None))
+
+    def flush_marker():
+        # An item that opens with something other than text, or is empty, still gets its marker
+        nonlocal pending_marker
+        if pending_marker is not None:
+            blocks.append(Block("bullet", [], len(lists) - 1, pending_marker))
+            pending_marker = None
+
+    tokens = markdown_parser.parse(content)
+    for index, token in enumerate(tokens):
+        if token.type == "bullet_list_open":
+            flush_marker()
+            lists.append(None)
+        elif token.type == "ordered_list_open":
+            flush_marker()
+            # Lists count up from their first item's number
+            lists.append(int(token.attrGet("start") or 1))
+        elif token.type in ("bullet_list_close", "ordered_list_close"):
+            lists.pop()
+        elif token.type == "list_item_open":
+            if lists[-1] is None:
+                pending_marker = BULLET
+            else:
+                pending_marker = f"{lists[-1]}."
+                lists[-1] += 1
+        elif token.type == "list_item_close":
+            flush_marker()
+        elif token.type == "heading_open":
+            runs = inline_runs(tokens[index + 1].children)
+            if lists:
+                add("heading", runs)
+            else:
+                blocks.append(Block("heading", runs, int(token.tag[1:]), None))
+        elif token.type == "paragraph_open":
+            add("paragraph", inline_runs(tokens[index + 1].children))
+        elif token.type in ("fence", "code_block"):
+            for block in code_blocks(token.content):
+                add(block.kind, block.runs)
+    return blocks
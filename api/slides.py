@@ -0,0 +1,275 @@
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image, ImageDraw, features
+
+from images import digest_bytes, load_images
+from pools import new_pool
+from slide_cache import slide_cache, slide_key
+from slide_markdown import parse_markdown
+from text_layout import get_default_font, styled_words, word_width, wrap_text, wrap_words
+
+SLIDE_WIDTH = 800
+SLIDE_HEIGHT = 600
+# Extra indent per level of list nesting
+LIST_INDENT = 40
+# Horizontal slant of emphasized text, in pixels per pixel of height
+OBLIQUE_SHEAR = 0.2
+SLIDE_RENDER_WORKERS = int(os.getenv("SLIDE_RENDER_WORKERS", str(os.cpu_count() or 1)))
+# Quality for the lossy formats, 1-100
+SLIDE_IMAGE_QUALITY = int(os.getenv("SLIDE_IMAGE_QUALITY", "85"))
+# zlib level for PNG, 0-9; slides are mostly flat colour, so a fast level
+# costs little size and is several times quicker than Pillow's default of 6
+SLIDE_PNG_COMPRESS_LEVEL = int(os.getenv("SLIDE_PNG_COMPRESS_LEVEL", "1"))
+
+IMAGE_MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+if features.check("webp"):
+    IMAGE_MEDIA_TYPES["webp"] = "image/webp"
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+class UnsupportedFormatError(Exception):
+    pass
+
+
+def image_save_options(image_format="png", quality=None, compress_level=None):
+    """
+    Pillow save arguments for a slide output format.
+
+    Args:
+        image_format (str): One of IMAGE_MEDIA_TYPES.
+        quality (int, optional): JPEG/WebP quality, defaults to SLIDE_IMAGE_QUALITY.
+        compress_level (int, optional): PNG zlib level, defaults to SLIDE_PNG_COMPRESS_LEVEL.
+
+    Returns:
+        dict: Keyword arguments for ``Image.save``.
+    """
+    if image_format not in IMAGE_MEDIA_TYPES:
+        raise UnsupportedFormatError(f"Unsupported image format {image_format!r}, expected one of {sorted(IMAGE_MEDIA_TYPES)}")
+
+    if image_format == "png":
+        compress_level = SLIDE_PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+        if not 0 <= compress_level <= 9:
+            raise UnsupportedFormatError("compress_level must be between 0 and 9")
+        return {"format": "PNG", "compress_level": compress_level}
+
+    quality = SLIDE_IMAGE_QUALITY if quality is None else quality
+    if not 1 <= quality <= 100:
+        raise UnsupportedFormatError("quality must be between 1 and 100")
+    return {"format": image_format.upper(), "quality": quality}
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_pool(SLIDE_RENDER_WORKERS)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def figure_size(width, height):
+    return width // 2, height // 2
+
+
+def encode_slide(title, content, image=None, image_subtitle=None, width=SLIDE_WIDTH, height=SLIDE_HEIGHT, save_options=None):
+    slide = create_slide(title, content, image, image_subtitle, width, height)
+    buffered = BytesIO()
+    slide.save(buffered, **(save_options or image_save_options()))
+    return buffered.getvalue()
+
+
+def image_digest(image):
+    return digest_bytes(image) if image is not None else None
+
+
+def is_cacheable(image_url, image):
+    # Don't pin a slide whose image failed to load, retry it next time
+    return not image_url or image is not None
+
+
+def render_slide(title, content, image_url=None, image_subtitle=None, width=SLIDE_WIDTH, height=SLIDE_HEIGHT, save_options=None):
+    """
+    Render a slide to image bytes, reusing a cached render of identical input.
+
+    The figure is revalidated first, and the slide is keyed on and drawn
+    from the same image bytes, so a changed remote image renders a new
+    slide. ``save_options`` come from ``image_save_options`` and default
+    to PNG.
+    """
+    save_options = save_options or image_save_options()
+    image = load_images([image_url], figure_size(width, height)).get(image_url)
+    key = slide_key(title, content, image_digest(image), image_subtitle, width, height, save_options)
+    data = slide_cache.get(key)
+    if data is None:
+        data = encode_slide(title, content, image, image_subtitle, width, height, save_options)
+        if is_cacheable(image_url, image):
+            slide_cache.put(key, data)
+    return data
+
+
+def render_slides(slides, width=SLIDE_WIDTH, height=SLIDE_HEIGHT, save_options=None):
+    """
+    Render several slides to image bytes, in order.
+
+    Figures are fetched or revalidated concurrently first, so slides are
+    keyed on the current image content. Cached slides are read from the
+    slide cache, and the rest are rasterized in a process pool so a deck
+    uses every core. Workers get the image bytes the slide was keyed on,
+    never the URL, so they don't touch the network.
+
+    Args:
+        slides (list): Tuples of (title, content, image_url, image_subtitle).
+        save_options (dict, optional): Output format from ``image_save_options``, defaults to PNG.
+
+    Returns:
+        List[bytes]: One encoded image per slide.
+    """
+    save_options = save_options or image_save_options()
+    loaded = load_images([slide[2] for slide in slides], figure_size(width, height))
+    digests = {url: image_digest(image) for url, image in loaded.items()}
+    keys = [
+        slide_key(title, content, digests.get(image_url), image_subtitle, width, height, save_options)
+        for title, content, image_url, image_subtitle in slides
+    ]
+    # The URL is swapped for its image, so a figure that changes after keying isn't drawn
+    inputs = [(title, content, loaded.get(image_url), image_subtitle) for title, content, image_url, image_subtitle in slides]
+    images = [slide_cache.get(key) for key in keys]
+    misses = [index for index, data in enumerate(images) if data is None]
+    if not misses:
+        return images
+
+    if len(misses) == 1 or SLIDE_RENDER_WORKERS <= 1:
+        rendered = [encode_slide(*inputs[index], width, height, save_options) for index in misses]
+    else:
+        futures = [get_pool().submit(encode_slide, *inputs[index], width, height, save_options) for index in misses]
+        rendered = [future.result() for future in futures]
+
+    for index, data in zip(misses, rendered):
+        images[index] = data
+        image_url = slides[index][2]
+        if is_cacheable(image_url, loaded.get(image_url)):
+            slide_cache.put(keys[index], data)
+    return images
+
+
+def draw_oblique(slide, position, text, font, stroke):
+    """
+    Draw ``text`` slanted to the right, since the default font has no italic face.
+
+    The text is drawn into a mask, sheared and pasted through it in black.
+    """
+    _, _, right, bottom = font.getbbox(text, stroke_width=stroke)
+    slant = int(OBLIQUE_SHEAR * bottom) + 1
+    mask = Image.new("L", (int(right) + slant, int(bottom)), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255, stroke_width=stroke, stroke_fill=255)
+    # Each output pixel samples the mask further left the higher it sits, so the top leans right
+    sheared = mask.transform(mask.size, Image.AFFINE, (1, OBLIQUE_SHEAR, -OBLIQUE_SHEAR * mask.height, 0, 1, 0), resample=Image.BICUBIC)
+    slide.paste("black", (int(position[0]), int(position[1])), sheared)
+
+
+def draw_words(slide, draw, words, font, font_size, x, y_offset, max_width):
+    """
+    Wrap and draw ``(word, (strong, em))`` pairs, returning the next line's y offset.
+
+    The default font has no bold or italic face, so strong words get a one
+    pixel stroke and emphasized words are slanted. Lines without emphasis
+    are drawn in a single call.
+    """
+    space_width = word_width(font, " ")
+    for line in wrap_words(words, font, max_width):
+        if not any(strong or em for _, (strong, em) in line):
+            draw.text((x, y_offset), " ".join(word for word, _ in line), font=font, fill="black")
+        else:
+            segment_x = x
+            segment = []
+            for index, (word, style) in enumerate(line):
+                segment.append(word)
+                if index + 1 < len(line) and line[index + 1][1] == style:
+                    continue
+                text = " ".join(segment)
+                strong, em = style
+                stroke = 1 if strong else 0
+                if em:
+                    draw_oblique(slide, (segment_x, y_offset), text, font, stroke)
+                else:
+                    draw.text((segment_x, y_offset), text, font=font, fill="black", stroke_width=stroke, stroke_fill="black")
+                segment_x += word_width(font, text) + space_width
+                segment = []
+        y_offset += font_size + 5
+    return y_offset
+
+
+def create_slide(title, content, image=None, image_subtitle=None, width=SLIDE_WIDTH, height=SLIDE_HEIGHT):
+    print(f"Creating slide: {title}")
+    try:
+        slide = Image.new('RGB', (width, height), color='white')
+        draw = ImageDraw.Draw(slide)
+
+        # Drastically increase font sizes
+        title_font_size = 60
+        content_font_size = 50
+        subtitle_font_size = 40
+
+        title_font = get_default_font(title_font_size)
+        content_font = get_default_font(content_font_size)
+        subtitle_font = get_default_font(subtitle_font_size)
+
+        # Draw title
+        title_width = width - 40
+        title_lines = wrap_text(title, title_font, title_width)
+        y_offset = 20
+        for line in title_lines:
+            draw.text((20, y_offset), line, font=title_font, fill="black")
+            y_offset += title_font_size + 5
+
+        # Lay out the content straight from the markdown blocks
+        content_width = width - 40
+        y_offset += 20
+
+        for block in parse_markdown(content):
+            words = styled_words((run.text, (run.strong, run.em)) for run in block.runs)
+            if block.kind == "heading":
+                header_size = content_font_size + 10
+                font = get_default_font(header_size)
+                y_offset = draw_words(slide, draw, words, font, header_size, 20, y_offset, content_width)
+            elif block.kind == "paragraph":
+                y_offset = draw_words(slide, draw, words, content_font, content_font_size, 20, y_offset, content_width)
+            else:
+                indent = min(LIST_INDENT * block.level, content_width // 2)
+                if block.marker:
+                    words.insert(0, (block.marker, (False, False)))
+                y_offset = draw_words(slide, draw, words, content_font, content_font_size, 40 + indent, y_offset, content_width - 20 - indent)
+
+        # Add image if provided, already downscaled by the image cache
+        if image:
+            try:
+                img_width, img_height = figure_size(width, height)
+                img = Image.open(BytesIO(image))
+                img.load()
+                img_position = (width - img_width - 20, height - img_height - 20)
+                slide.paste(img, img_position)
+
+                if image_subtitle:
+                    subtitle_lines = wrap_text(image_subtitle, subtitle_font, img_width)
+                    subtitle_y = height - 30 - (len(subtitle_lines) * (subtitle_font_size + 5))
+                    for line in subtitle_lines:
+                        draw.text((width - img_width - 20, subtitle_y), line, font=subtitle_font, fill="black")
+                        subtitle_y += subtitle_font_size + 5
+            except Exception as e:
+                print(f"Error loading image: {e}")
+
+        return slide
+    except Exception as e:
+        print(f"Error in create_slide: {str(e)}")
+        raise
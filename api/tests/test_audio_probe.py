@@ -0,0 +1,56 @@
+import subprocess
+
+import pytest
+
+import audio_probe
+from video import FFMPEG_BINARY
+
+# A tone, then near silence, so a VBR encoder drops its bitrate halfway
+SOURCE = ["-f", "lavfi", "-i", "sine=frequency=220:duration=6", "-f", "lavfi", "-i", "anoisesrc=d=6:a=0.3",
+          "-filter_complex", "[0][1]amix=inputs=2,volume=enable='gt(t,3)':volume=0.01"]
+
+FIXTURES = {
+    "cbr.mp3": ["-c:a", "libmp3lame", "-b:a", "64k"],
+    "cbr_id3.mp3": ["-c:a", "libmp3lame", "-b:a", "64k", "-metadata", "title=Lecture", "-id3v2_version", "3"],
+    "vbr.mp3": ["-c:a", "libmp3lame", "-q:a", "6"],
+    "vbr_no_xing.mp3": ["-c:a", "libmp3lame", "-q:a", "6", "-write_xing", "0"],
+    "audio.wav": ["-c:a", "pcm_s16le", "-ar", "8000"],
+    "audio.m4a": ["-c:a", "aac", "-b:a", "32k"],
+}
+
+
+@pytest.fixture(scope="module")
+def audio_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("audio")
+    paths = {}
+    for name, args in FIXTURES.items():
+        path = str(directory / name)
+        result = subprocess.run([FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", *SOURCE, *args, path], capture_output=True)
+        if result.returncode != 0:
+            pytest.skip(f"ffmpeg can't encode {name}: {result.stderr.decode(errors='replace')}")
+        paths[name] = path
+    return paths
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_header_duration(audio_files, name):
+    # Encoders pad the last frame, so allow a few frames either way
+    assert audio_probe.header_duration(audio_files[name]) == pytest.approx(6.0, abs=0.1)
+
+
+def test_vbr_without_xing_header_is_not_read_as_cbr(audio_files):
+    assert audio_probe.probe_duration(audio_files["vbr_no_xing.mp3"]) == pytest.approx(6.0, abs=0.1)
+
+
+def test_junk_between_frames_falls_back_to_ffmpeg(audio_files, tmp_path):
+    data = open(audio_files["vbr_no_xing.mp3"], "rb").read()
+    path = tmp_path / "junk.mp3"
+    path.write_bytes(data[:len(data) // 2] + b"\0" * 4096 + data[len(data) // 2:])
+    assert audio_probe.header_duration(str(path)) is None
+
+
+def test_probe_durations_caches_by_content(audio_files, monkeypatch):
+    path = audio_files["cbr.mp3"]
+    first = audio_probe.probe_durations([path])
+    monkeypatch.setattr(audio_probe, "probe_duration", lambda path: pytest.fail("probed again"))
+    assert audio_probe.probe_durations([path, path]) == first * 2
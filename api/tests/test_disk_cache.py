@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import disk_cache
+from disk_cache import DiskLRU
+from extraction_cache import ExtractionCache
+from slide_cache import SlideCache
+
+
+def age(lru, name, seconds):
+    # Make an entry look last used ``seconds`` ago
+    mtime = os.stat(lru.path(name)).st_mtime - seconds
+    os.utime(lru.path(name), (mtime, mtime))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    lru = DiskLRU(str(tmp_path), 350, (".bin",))
+    for index, name in enumerate(["a.bin", "b.bin", "c.bin"]):
+        lru.put(name, b"x" * 100)
+        age(lru, name, 30 - index * 10)
+    lru.touch("a.bin")
+
+    assert lru.put("c.bin", b"y" * 100) == []
+    assert lru.put("d.bin", b"x" * 100) == ["b.bin"]
+    assert sorted(os.listdir(tmp_path)) == ["a.bin", "c.bin", "d.bin"]
+    assert lru.size == 300
+
+
+def test_puts_under_budget_do_not_rescan(tmp_path, monkeypatch):
+    (tmp_path / "old.bin").write_bytes(b"x" * 100)
+    lru = DiskLRU(str(tmp_path), 1000, (".bin",))
+    lru.put("a.bin", b"x" * 100)
+    assert lru.size == 200
+
+    monkeypatch.setattr(lru, "entries", lambda: pytest.fail("rescanned"))
+    lru.put("b.bin", b"x" * 100)
+    lru.put("a.bin", b"x" * 50)
+    assert lru.size == 250
+
+
+def test_eviction_frees_down_to_the_low_water_mark(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "DISK_CACHE_LOW_WATER", 0.5)
+    lru = DiskLRU(str(tmp_path), 400, (".bin",))
+    for index in range(4):
+        lru.put(f"{index}.bin", b"x" * 100)
+        age(lru, f"{index}.bin", 40 - index * 10)
+
+    assert lru.put("4.bin", b"x" * 100) == ["0.bin", "1.bin", "2.bin"]
+    assert lru.size == 200
+
+
+def test_the_entry_being_added_is_kept(tmp_path):
+    lru = DiskLRU(str(tmp_path), 10, (".bin",))
+    assert lru.put("big.bin", b"x" * 100) == []
+    assert os.listdir(tmp_path) == ["big.bin"]
+
+
+def test_slide_cache_drops_evicted_slides_from_memory(tmp_path):
+    cache = SlideCache(directory=str(tmp_path), memory_bytes=1000, disk_bytes=150)
+    cache.put("a.png", b"a" * 100)
+    age(cache.disk, "a.png", 10)
+    cache.put("b.png", b"b" * 100)
+
+    assert "a.png" not in cache.memory
+    assert cache.memory_size == 100
+    assert cache.get("a.png") is None
+    assert cache.get("b.png") == b"b" * 100
+
+
+def test_extraction_cache_evicts_whole_entries(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path), max_bytes=600)
+    cache.put("one", "pdftext", 1, {0: "x" * 300}, blobs={"image.png": b"x" * 100})
+    age(cache.disk, os.path.join("one-pdftext", "entry.json"), 10)
+    cache.put("two", "pdftext", 1, {0: "y" * 300})
+
+    assert cache.get("one", "pdftext") is None
+    assert os.listdir(tmp_path) == ["two-pdftext"]
+    assert cache.get("two", "pdftext")["pages"] == {0: "y" * 300}
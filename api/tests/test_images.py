@@ -0,0 +1,128 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import images
+import slides
+from slide_cache import SlideCache
+
+
+def png_bytes(color):
+    buffered = BytesIO()
+    Image.new("RGB", (64, 48), color=color).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class Origin:
+    """
+    Local stand-in for a figure host that answers conditional GETs.
+    """
+
+    def __init__(self):
+        self.set_image(png_bytes("red"), '"v1"')
+        self.statuses = []
+        self.request_headers = []
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                origin.request_headers.append(dict(self.headers))
+                if self.headers.get("If-None-Match") == origin.etag:
+                    origin.statuses.append(304)
+                    self.send_response(304)
+                    self.send_header("ETag", origin.etag)
+                    self.end_headers()
+                    return
+                origin.statuses.append(200)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(origin.body)))
+                self.send_header("ETag", origin.etag)
+                self.end_headers()
+                self.wfile.write(origin.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/figure.png"
+
+    def set_image(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def origin():
+    origin = Origin()
+    yield origin
+    origin.close()
+
+
+@pytest.fixture(autouse=True)
+def image_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_CACHE_DIR", str(tmp_path / "images"))
+    # Revalidate on every use
+    monkeypatch.setattr(images, "IMAGE_CACHE_FRESH_SECONDS", -1)
+    monkeypatch.setattr(slides, "slide_cache", SlideCache(directory=str(tmp_path / "slides")))
+
+
+def test_not_modified_reuses_cached_image(origin):
+    first = images.resolve_image(origin.url, (32, 32))
+    second = images.resolve_image(origin.url, (32, 32))
+
+    assert origin.statuses == [200, 304]
+    assert origin.request_headers[1]["If-None-Match"] == '"v1"'
+    assert first == second
+    assert images.fetch_image(origin.url, (32, 32)).getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_changed_image_is_refetched(origin):
+    first = images.resolve_image(origin.url, (32, 32))
+    origin.set_image(png_bytes("blue"), '"v2"')
+    second = images.resolve_image(origin.url, (32, 32))
+
+    assert origin.statuses == [200, 200]
+    assert first != second
+    assert images.fetch_image(origin.url, (32, 32)).getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_cached_slide_follows_changed_image(origin):
+    first = slides.render_slide("Title", "Body", origin.url)
+    assert slides.render_slide("Title", "Body", origin.url) == first
+
+    origin.set_image(png_bytes("blue"), '"v2"')
+    assert slides.render_slide("Title", "Body", origin.url) != first
+
+
+def test_cache_is_bounded(origin, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_CACHE_MAX_BYTES", 1)
+    images.resolve_image(origin.url, (32, 32))
+    images.resolve_image(origin.url + "?other", (32, 32))
+
+    cached = [name for name in images.os.listdir(images.IMAGE_CACHE_DIR) if name.endswith(".png")]
+    assert len(cached) == 1
+
+
+def test_pooled_slides_draw_the_keyed_image(origin, monkeypatch):
+    monkeypatch.setattr(slides, "SLIDE_RENDER_WORKERS", 2)
+    slides.shutdown_pool()
+    try:
+        rendered = slides.render_slides([("One", "Body", origin.url, None), ("Two", "Body", origin.url, "Figure")])
+    finally:
+        slides.shutdown_pool()
+
+    # Only the parent fetched; workers drew from the bytes they were handed
+    assert origin.statuses == [200]
+    img_width, img_height = slides.figure_size(slides.SLIDE_WIDTH, slides.SLIDE_HEIGHT)
+    corner = (slides.SLIDE_WIDTH - img_width - 10, slides.SLIDE_HEIGHT - img_height - 10)
+    assert Image.open(BytesIO(rendered[0])).getpixel(corner) == (255, 0, 0)
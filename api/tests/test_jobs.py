@@ -0,0 +1,41 @@
+import time
+
+from jobs import Job, MemoryJobStore
+
+
+def job(job_id, status, updated_at=None):
+    now = time.time()
+    return Job(job_id=job_id, status=status, created_at=now, updated_at=updated_at or now)
+
+
+def test_oldest_finished_jobs_are_dropped_past_the_limit():
+    store = MemoryJobStore(max_finished=2)
+    store.save(job("running", "running"))
+    for job_id in ["a", "b", "c"]:
+        store.save(job(job_id, "done"))
+
+    assert store.get("a") is None
+    assert store.get("b").status == "done"
+    assert store.get("c").status == "done"
+    assert store.get("running").status == "running"
+
+
+def test_expired_finished_jobs_are_dropped_on_save():
+    store = MemoryJobStore(finished_ttl=60)
+    store.save(job("old", "failed", updated_at=time.time() - 120))
+    store.save(job("queued", "queued", updated_at=time.time() - 120))
+    store.save(job("new", "done"))
+
+    assert store.get("old") is None
+    assert store.get("queued").status == "queued"
+    assert store.get("new").status == "done"
+
+
+def test_a_job_counts_as_finished_from_its_last_save():
+    store = MemoryJobStore(max_finished=1)
+    store.save(job("a", "queued"))
+    store.save(job("b", "done"))
+    store.save(job("a", "done"))
+
+    assert store.get("b") is None
+    assert store.get("a").status == "done"
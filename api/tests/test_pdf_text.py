@@ -0,0 +1,47 @@
+from concurrent.futures import TimeoutError
+
+import pypdfium2 as pdfium
+import pytest
+
+import pdf_text
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "blank.pdf"
+    doc = pdfium.PdfDocument.new()
+    for _ in range(3):
+        doc.new_page(200, 200)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def fresh_pool():
+    pdf_text.shutdown_pool()
+    yield
+    pdf_text.shutdown_pool()
+
+
+def test_pool_created_while_pdfium_lock_is_held(pdf_path, fresh_pool):
+    # Another request is inside pdfium when this one starts the pool; the
+    # workers must not inherit the lock in its held state
+    with pdf_text.pdfium_lock:
+        pool = pdf_text.get_pool()
+        future = pool.submit(pdf_text.extract_page_texts, pdf_path, 0, 3, "pypdfium2")
+    try:
+        assert future.result(timeout=30) == ["", "", ""]
+    except TimeoutError:
+        # Deadlocked workers would otherwise hang the pool shutdown
+        for process in pool._processes.values():
+            process.kill()
+        raise
+
+
+def test_extract_pages_through_pool(pdf_path, fresh_pool, monkeypatch):
+    monkeypatch.setattr(pdf_text, "PDF_PARALLEL_MIN_PAGES", 1)
+    total_pages, pages, texts = pdf_text.extract_pages(pdf_path, workers=2, backend_name="pypdfium2")
+    assert total_pages == 3
+    assert list(pages) == [0, 1, 2]
+    assert texts == ["", "", ""]
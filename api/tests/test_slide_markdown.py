@@ -0,0 +1,94 @@
+from slide_markdown import BULLET, Run, parse_markdown
+
+
+def texts(blocks):
+    return [(block.kind, "".join(run.text for run in block.runs), block.level, block.marker) for block in blocks]
+
+
+def test_headings():
+    blocks = parse_markdown("# Title\n\nSetext one\n==========\n\nSetext two\n---\n\n### Small ###")
+    assert texts(blocks) == [
+        ("heading", "Title", 1, None),
+        ("heading", "Setext one", 1, None),
+        ("heading", "Setext two", 2, None),
+        ("heading", "Small", 3, None),
+    ]
+
+
+def test_paragraph_lines_are_joined():
+    assert texts(parse_markdown("first line\nsecond line\n\nnext")) == [
+        ("paragraph", "first line second line", 0, None),
+        ("paragraph", "next", 0, None),
+    ]
+
+
+def test_emphasis():
+    blocks = parse_markdown("plain *em* **strong** ***both*** _under_ `code *not em*`")
+    assert blocks[0].runs == [
+        Run("plain ", False, False),
+        Run("em", False, True),
+        Run(" ", False, False),
+        Run("strong", True, False),
+        Run(" ", False, False),
+        Run("both", True, True),
+        Run(" ", False, False),
+        Run("under", False, True),
+        Run(" code *not em*", False, False),
+    ]
+
+
+def test_links_images_and_html():
+    blocks = parse_markdown("see [the docs](http://x) and <http://y> ![alt](i.png) <b>bold</b> &amp;")
+    assert texts(blocks) == [("paragraph", "see the docs and http://y  bold &", 0, None)]
+
+
+def test_nested_lists():
+    content = "- one\n  - one.a\n    - one.a.i\n- two\n\n1. first\n2. second\n   * inner\n3. third"
+    assert texts(parse_markdown(content)) == [
+        ("bullet", "one", 0, BULLET),
+        ("bullet", "one.a", 1, BULLET),
+        ("bullet", "one.a.i", 2, BULLET),
+        ("bullet", "two", 0, BULLET),
+        ("bullet", "first", 0, "1."),
+        ("bullet", "second", 0, "2."),
+        ("bullet", "inner", 1, BULLET),
+        ("bullet", "third", 0, "3."),
+    ]
+
+
+def test_ordered_list_counts_from_its_start():
+    assert [block.marker for block in parse_markdown("7. a\n1. b\n9. c")] == ["7.", "8.", "9."]
+
+
+def test_loose_list_item_paragraphs():
+    content = "- item\n\n  more about it\n- empty next\n-"
+    assert texts(parse_markdown(content)) == [
+        ("bullet", "item", 0, BULLET),
+        ("bullet", "more about it", 0, ""),
+        ("bullet", "empty next", 0, BULLET),
+        ("bullet", "", 0, BULLET),
+    ]
+
+
+def test_fenced_code_is_kept():
+    assert texts(parse_markdown("```python\ncode line\n\n  indented\n```\nafter")) == [
+        ("paragraph", "code line", 0, None),
+        ("paragraph", "indented", 0, None),
+        ("paragraph", "after", 0, None),
+    ]
+
+
+def test_code_in_list_item():
+    assert texts(parse_markdown("- ```\n  x = 1\n  ```")) == [("bullet", "x = 1", 0, BULLET)]
+
+
+def test_blockquotes_and_rules():
+    assert texts(parse_markdown("> quoted *text*\n> more\n\n---\n\nafter")) == [
+        ("paragraph", "quoted text more", 0, None),
+        ("paragraph", "after", 0, None),
+    ]
+
+
+def test_empty_content():
+    assert parse_markdown("") == []
+    assert parse_markdown("\n\n   \n") == []
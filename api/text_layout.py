@@ -0,0 +1,111 @@
+from functools import lru_cache
+
+from PIL import ImageFont
+
+WORD_WIDTH_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=None)
+def get_default_font(size):
+    """
+    Default font at ``size``; built once per size and shared by all slides.
+    """
+    return ImageFont.load_default().font_variant(size=size)
+
+
+@lru_cache(maxsize=WORD_WIDTH_CACHE_SIZE)
+def word_width(font, word):
+    return font.getlength(word)
+
+
+def split_long_word(word, font, max_width):
+    """
+    Break a word wider than ``max_width`` into pieces that each fit.
+
+    The longest fitting prefix is found by binary search, so a word costs
+    O(log n) width measurements per piece.
+    """
+    pieces = []
+    while word and word_width(font, word) > max_width:
+        low, high = 1, len(word) - 1
+        fit = 1
+        while low <= high:
+            mid = (low + high) // 2
+            if word_width(font, word[:mid]) <= max_width:
+                fit = mid
+                low = mid + 1
+            else:
+                high = mid - 1
+        pieces.append(word[:fit])
+        word = word[fit:]
+    if word:
+        pieces.append(word)
+    return pieces
+
+
+def styled_words(runs):
+    """
+    Split styled ``(text, style)`` runs into ``(word, style)`` pairs.
+
+    A word that spans runs, such as ``**bold**ness``, keeps the style of the
+    run it starts in.
+    """
+    words = []
+    joined = False
+    for text, style in runs:
+        pieces = text.split()
+        if pieces and joined and not text[0].isspace():
+            words[-1] = (words[-1][0] + pieces.pop(0), words[-1][1])
+        words.extend((piece, style) for piece in pieces)
+        if text:
+            joined = bool(words) and not text[-1].isspace()
+    return words
+
+
+def wrap_words(words, font, max_width):
+    """
+    Greedily break ``(word, style)`` pairs into lines no wider than ``max_width``.
+
+    Line widths are the sum of memoized word widths plus spaces, so each word
+    is measured once no matter how long the paragraph is.
+
+    Returns:
+        List[List[Tuple[str, Any]]]: The words of each line.
+    """
+    space_width = word_width(font, " ")
+    lines = []
+    current_words = []
+    current_width = 0
+
+    for word, style in words:
+        width = word_width(font, word)
+        if width > max_width:
+            pieces = split_long_word(word, font, max_width)
+            word = pieces.pop()
+            width = word_width(font, word)
+            if current_words:
+                lines.append(current_words)
+            lines.extend([(piece, style)] for piece in pieces)
+            current_words = []
+            current_width = 0
+
+        if current_words and current_width + space_width + width <= max_width:
+            current_words.append((word, style))
+            current_width += space_width + width
+        else:
+            if current_words:
+                lines.append(current_words)
+            current_words = [(word, style)]
+            current_width = width
+
+    if current_words:
+        lines.append(current_words)
+    return lines
+
+
+def wrap_text(text, font, max_width):
+    """
+    Greedily break ``text`` into lines no wider than ``max_width``.
+    """
+    words = [(word, None) for word in text.split()]
+    return [" ".join(word for word, _ in line) for line in wrap_words(words, font, max_width)]
@@ -0,0 +1,111 @@
+import os
+import shutil
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+def too_large_detail(limit):
+    return f"Upload exceeds the {limit} byte limit."
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects request bodies over ``limit`` bytes before they are parsed.
+
+    A ``Content-Length`` over the limit is answered with 413 without reading
+    the body. Bodies without one (chunked uploads) are counted as they
+    arrive and abandoned with 413 as soon as they pass the limit, so
+    nothing past it is spooled to disk.
+    """
+
+    def __init__(self, app, limit=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.limit:
+            response = JSONResponse({"detail": too_large_detail(self.limit)}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # FastAPI passes HTTPExceptions from body parsing through unchanged
+                    raise HTTPException(status_code=413, detail=too_large_detail(self.limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class UploadBudget:
+    """
+    Running total of bytes accepted across all files of one request.
+    """
+
+    def __init__(self, limit=MAX_UPLOAD_BYTES):
+        self.limit = limit
+        self.used = 0
+
+    def consume(self, size):
+        self.used += size
+        if self.used > self.limit:
+            raise UploadTooLargeError(too_large_detail(self.limit))
+
+
+def upload_size(upload: UploadFile):
+    if upload.size is not None:
+        return upload.size
+    upload.file.seek(0, os.SEEK_END)
+    return upload.file.tell()
+
+
+def copy_upload(source, path, chunk_size=UPLOAD_CHUNK_SIZE, hasher=None):
+    source.seek(0)
+    with open(path, "wb") as f:
+        if hasher is None:
+            shutil.copyfileobj(source, f, chunk_size)
+            return
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            f.write(chunk)
+
+
+async def spool_upload(upload: UploadFile, path, budget: UploadBudget, chunk_size=UPLOAD_CHUNK_SIZE, hasher=None):
+    """
+    Move an upload that Starlette has already spooled to ``path``.
+
+    The size is checked against ``budget`` before anything is written, and
+    the copy runs off the event loop one chunk at a time. If given,
+    ``hasher`` (a hashlib object) is updated with the file contents.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    size = upload_size(upload)
+    budget.consume(size)
+    await run_in_threadpool(copy_upload, upload.file, path, chunk_size, hasher)
+    return size
@@ -0,0 +1,151 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
+
+from moviepy.config import get_setting
+
+from digests import digest_file
+from segment_cache import segment_key
+
+FFMPEG_BINARY = get_setting("FFMPEG_BINARY")
+
+# Every segment is encoded with the same parameters so the concat demuxer can
+# join them with a stream copy.
+VIDEO_FPS = int(os.getenv("VIDEO_FPS", "24"))
+AUDIO_SAMPLE_RATE = 44100
+AUDIO_CHANNELS = 2
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", str(os.cpu_count() or 1)))
+VIDEO_PRESET = "veryfast"
+# Part of every segment cache key; cached segments encoded with other
+# settings couldn't be stream-copied together with new ones
+ENCODER_SETTINGS = {
+    "fps": VIDEO_FPS,
+    "preset": VIDEO_PRESET,
+    "audio_sample_rate": AUDIO_SAMPLE_RATE,
+    "audio_channels": AUDIO_CHANNELS,
+}
+
+
+def run_ffmpeg(args):
+    command = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", *args]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+
+
+def encode_segment(image_path, audio_path, duration, output_path):
+    """
+    Encode a single still slide with its voiceover into an MP4 segment.
+
+    Args:
+        image_path (str): Path to the slide PNG.
+        audio_path (str): Path to the voiceover audio.
+        duration (float): Length of the segment in seconds.
+        output_path (str): Where to write the segment.
+
+    Returns:
+        str: The output path.
+    """
+    run_ffmpeg([
+        "-loop", "1",
+        "-framerate", str(VIDEO_FPS),
+        "-i", image_path,
+        "-i", audio_path,
+        "-t", f"{duration:.3f}",
+        "-c:v", "libx264",
+        "-tune", "stillimage",
+        "-preset", VIDEO_PRESET,
+        "-pix_fmt", "yuv420p",
+        "-r", str(VIDEO_FPS),
+        "-c:a", "aac",
+        "-ar", str(AUDIO_SAMPLE_RATE),
+        "-ac", str(AUDIO_CHANNELS),
+        "-movflags", "+faststart",
+        output_path,
+    ])
+    return output_path
+
+
+def concat_segments(segment_paths: List[str], output_path):
+    """
+    Join encoded segments into one MP4 without re-encoding.
+    """
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w") as list_file:
+        for segment_path in segment_paths:
+            escaped = os.path.abspath(segment_path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+    try:
+        run_ffmpeg([
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_path,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_path,
+        ])
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def encode_video(image_paths, audio_paths, durations, output_path, workers=ENCODE_WORKERS, progress=None, segment_cache=None, on_segment=None):
+    """
+    Encode one segment per slide in parallel, then stream-copy them together.
+
+    Each segment is encoded by its own ffmpeg process, so a thread pool is
+    enough to spread the work across cores. ``progress`` is called from the
+    calling thread with the number of finished segments.
+
+    With ``segment_cache`` (a SegmentCache), segments whose slide image,
+    audio and duration were encoded before are reused, and new segments are
+    added to the cache, so re-rendering an edited video only encodes the
+    slides that changed.
+
+    ``on_segment`` is called from the calling thread with the index and path
+    of every segment as soon as it is ready, in completion order.
+    """
+    segment_paths = [f"{os.path.splitext(image_path)[0]}.segment.mp4" for image_path in image_paths]
+    jobs = list(zip(image_paths, audio_paths, durations, segment_paths))
+    keys = [None] * len(jobs)
+    done = 0
+    try:
+        if segment_cache is not None:
+            digests = {}
+            for index, (image_path, audio_path, duration, segment_path) in enumerate(jobs):
+                for path in (image_path, audio_path):
+                    if path not in digests:
+                        digests[path] = digest_file(path)
+                keys[index] = segment_key(digests[image_path], digests[audio_path], duration, ENCODER_SETTINGS)
+            misses = []
+            for index, key in enumerate(keys):
+                if segment_cache.get(key, segment_paths[index]):
+                    done += 1
+                    if on_segment:
+                        on_segment(index, segment_paths[index])
+                else:
+                    misses.append(index)
+            print(f"Segment cache: {done} of {len(jobs)} segments reused")
+            if progress and done:
+                progress(done)
+        else:
+            misses = list(range(len(jobs)))
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(encode_segment, *jobs[index]): index for index in misses}
+            for future in as_completed(futures):
+                future.result()
+                index = futures[future]
+                if segment_cache is not None:
+                    segment_cache.put(keys[index], segment_paths[index])
+                if on_segment:
+                    on_segment(index, segment_paths[index])
+                done += 1
+                if progress:
+                    progress(done)
+        return concat_segments(segment_paths, output_path)
+    finally:
+        for segment_path in segment_paths:
+            if os.path.exists(segment_path):
+                os.remove(segment_path)
@@ -0,0 +1,56 @@
+import errno
+import os
+import shutil
+import tempfile
+
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT") or None  # None uses the system temp dir
+
+
+class Workspace:
+    """
+    Private scratch directory for one request or job.
+
+    Intermediate files are written here instead of the shared static folder,
+    so concurrent jobs never see each other's files. Finished artifacts are
+    moved into place with ``promote``; everything else goes with ``cleanup``.
+    """
+
+    def __init__(self, prefix="job_"):
+        if WORKSPACE_ROOT:
+            os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+        self.root = tempfile.mkdtemp(prefix=prefix, dir=WORKSPACE_ROOT)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def promote(self, name, destination):
+        """
+        Atomically publish a workspace file at ``destination``.
+
+        Readers see either no file or the complete file. When the workspace is
+        on another filesystem the file is first copied next to the destination
+        and then renamed into place.
+        """
+        source = self.path(name)
+        try:
+            os.replace(source, destination)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            tmp_destination = f"{destination}.{os.path.basename(self.root)}.tmp"
+            try:
+                shutil.copyfile(source, tmp_destination)
+                os.replace(tmp_destination, destination)
+            finally:
+                if os.path.exists(tmp_destination):
+                    os.remove(tmp_destination)
+        return destination
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
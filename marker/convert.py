@@ -10,7 +10,7 @@ import torch.multiprocessing as mp
 from tqdm import tqdm
 import math
 
-from marker.convert import convert_single_pdf
+from marker.convert import convert_single_pdf, convert_pdfs_pipelined
 from marker.output import markdown_exists, save_markdown
 from marker.pdf.utils import find_filetype
 from marker.pdf.extract_text import get_length_of_text
@@ -36,36 +36,69 @@ def worker_exit():
     del model_refs
 
 
-def process_single_pdf(args):
-    filepath, out_folder, metadata, min_length = args
-
+def should_convert(filepath, out_folder, min_length):
     fname = os.path.basename(filepath)
     if markdown_exists(out_folder, fname):
-        return
+        return False
+
+    # Skip trying to convert files that don't have a lot of embedded text
+    # This can indicate that they were scanned, and not OCRed properly
+    # Usually these files are not recent/high-quality
+    if min_length:
+        filetype = find_filetype(filepath)
+        if filetype == "other":
+            return False
+
+        length = get_length_of_text(filepath)
+        if length < min_length:
+            return False
+    return True
+
+
+def save_converted(filepath, out_folder, full_text, images, out_metadata):
+    if len(full_text.strip()) > 0:
+        save_markdown(out_folder, os.path.basename(filepath), full_text, images, out_metadata)
+    else:
+        print(f"Empty file: {filepath}.  Could not convert.")
+
+
+def process_single_pdf(args):
+    filepath, out_folder, metadata, min_length = args
 
     try:
-        # Skip trying to convert files that don't have a lot of embedded text
-        # This can indicate that they were scanned, and not OCRed properly
-        # Usually these files are not recent/high-quality
-        if min_length:
-            filetype = find_filetype(filepath)
-            if filetype == "other":
-                return 0
-
-            length = get_length_of_text(filepath)
-            if length < min_length:
-                return
+        if not should_convert(filepath, out_folder, min_length):
+            return
 
         full_text, images, out_metadata = convert_single_pdf(filepath, model_refs, metadata=metadata)
-        if len(full_text.strip()) > 0:
-            save_markdown(out_folder, fname, full_text, images, out_metadata)
-        else:
-            print(f"Empty file: {filepath}.  Could not convert.")
+        save_converted(filepath, out_folder, full_text, images, out_metadata)
     except Exception as e:
         print(f"Error converting {filepath}: {e}")
         print(traceback.format_exc())
 
 
+def process_pdf_batch(batch_args):
+    # Convert a batch through one pipeline, so pdf extraction and markdown generation overlap with the models
+    def tasks():
+        for filepath, out_folder, metadata, min_length in batch_args:
+            try:
+                if should_convert(filepath, out_folder, min_length):
+                    yield filepath, metadata
+            except Exception as e:
+                print(f"Error converting {filepath}: {e}")
+                print(traceback.format_exc())
+
+    out_folder = batch_args[0][1]
+    for filepath, result in convert_pdfs_pipelined(tasks(), model_refs):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            save_converted(filepath, out_folder, *result)
+        except Exception as e:
+            print(f"Error converting {filepath}: {e}")
+            print(traceback.format_exc())
+    return len(batch_args)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Convert multiple pdfs to markdown.")
     parser.add_argument("in_folder", help="Input folder with pdfs.")
@@ -76,6 +109,8 @@ def main():
     parser.add_argument("--workers", type=int, default=5, help="Number of worker processes to use.  Peak VRAM usage per process is 5GB, but avg is closer to 3.5GB.")
     parser.add_argument("--metadata_file", type=str, default=None, help="Metadata json file to use for languages")
     parser.add_argument("--min_length", type=int, default=None, help="Minimum length of pdf to convert")
+    parser.add_argument("--pipeline", action="store_true", help="Overlap pdf extraction and markdown generation with model inference inside each worker")
+    parser.add_argument("--pipeline_batch", type=int, default=16, help="Number of pdfs each worker pushes through one pipeline")
 
     args = parser.parse_args()
 
@@ -125,7 +160,13 @@ def main():
     task_args = [(f, out_folder, metadata.get(os.path.basename(f)), args.min_length) for f in files_to_convert]
 
     with mp.Pool(processes=total_processes, initializer=worker_init, initargs=(model_lst,)) as pool:
-        list(tqdm(pool.imap(process_single_pdf, task_args), total=len(task_args), desc="Processing PDFs", unit="pdf"))
+        if args.pipeline:
+            batches = [task_args[i:i + args.pipeline_batch] for i in range(0, len(task_args), args.pipeline_batch)]
+            with tqdm(total=len(task_args), desc="Processing PDFs", unit="pdf") as pbar:
+                for batch_count in pool.imap_unordered(process_pdf_batch, batches):
+                    pbar.update(batch_count)
+        else:
+            list(tqdm(pool.imap(process_single_pdf, task_args), total=len(task_args), desc="Processing PDFs", unit="pdf"))
 
         pool._worker_handler.terminate = worker_exit
 
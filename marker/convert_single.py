@@ -23,6 +23,7 @@ def main():
     parser.add_argument("--start_page", type=int, default=None, help="Page to start processing at")
     parser.add_argument("--langs", type=str, help="Optional languages to use for OCR, comma separated", default=None)
     parser.add_argument("--batch_multiplier", type=int, default=2, help="How much to increase batch sizes")
+    parser.add_argument("--window_size", type=int, default=None, help="Run the models over this many pages at a time, to bound memory on long pdfs")
     args = parser.parse_args()
 
     langs = args.langs.split(",") if args.langs else None
@@ -30,13 +31,15 @@ def main():
     fname = args.filename
     model_lst = load_all_models()
     start = time.time()
-    full_text, images, out_meta = convert_single_pdf(fname, model_lst, max_pages=args.max_pages, langs=langs, batch_multiplier=args.batch_multiplier, start_page=args.start_page)
+    full_text, images, out_meta = convert_single_pdf(fname, model_lst, max_pages=args.max_pages, langs=langs, batch_multiplier=args.batch_multiplier, start_page=args.start_page, window_size=args.window_size)
 
     fname = os.path.basename(fname)
     subfolder_path = save_markdown(args.output, fname, full_text, images, out_meta)
 
     print(f"Saved markdown to the {subfolder_path} folder")
     print(f"Total time: {time.time() - start}")
+    for stage, timing in out_meta.get("timings", {}).items():
+        print(f"  {stage}: {timing['wall']:.2f}s wall, {timing['cpu']:.2f}s cpu, {timing['peak_rss_delta_mb']:.0f}MB peak rss increase")
 
 
 if __name__ == "__main__":
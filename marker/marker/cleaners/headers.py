@@ -3,33 +3,63 @@ from collections import Counter
 from rapidfuzz import fuzz
 
 from marker.schema.merged import FullyMergedBlock
-from typing import List, Tuple
+from typing import List, Tuple, Set
 
 
-def filter_common_elements(lines, page_count, threshold=.6):
+def find_common_text(counter: Counter, page_count, threshold=.6) -> Set[str]:
     # We can't filter if we don't have enough pages to find common elements
     if page_count < 3:
-        return []
+        return set()
+    return {k for k, v in counter.items() if v > page_count * threshold}
+
+
+def filter_common_elements(lines, page_count, threshold=.6):
     text = [s.text for line in lines for s in line.spans if len(s.text) > 4]
-    counter = Counter(text)
-    common = [k for k, v in counter.items() if v > page_count * threshold]
+    common = find_common_text(Counter(text), page_count, threshold)
     bad_span_ids = [s.span_id for line in lines for s in line.spans if s.text in common]
     return bad_span_ids
 
 
-def filter_header_footer(all_page_blocks, max_selected_lines=2):
+def get_edge_lines(all_page_blocks, max_selected_lines=2):
     first_lines = []
     last_lines = []
     for page in all_page_blocks:
         nonblank_lines = page.get_nonblank_lines()
         first_lines.extend(nonblank_lines[:max_selected_lines])
         last_lines.extend(nonblank_lines[-max_selected_lines:])
+    return first_lines, last_lines
+
+
+def filter_header_footer(all_page_blocks, max_selected_lines=2):
+    first_lines, last_lines = get_edge_lines(all_page_blocks, max_selected_lines)
 
     bad_span_ids = filter_common_elements(first_lines, len(all_page_blocks))
     bad_span_ids += filter_common_elements(last_lines, len(all_page_blocks))
     return bad_span_ids
 
 
+def get_edge_spans(page, max_selected_lines=2) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    # (span_id, text) of the first and last lines of a page, taken where filter_header_footer would look at them
+    first_lines, last_lines = get_edge_lines([page], max_selected_lines)
+    return (
+        [(s.span_id, s.text) for line in first_lines for s in line.spans],
+        [(s.span_id, s.text) for line in last_lines for s in line.spans]
+    )
+
+
+def filter_edge_spans(edge_spans: List[Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]], threshold=.6) -> List[Set[str]]:
+    # Same as filter_header_footer, for pages whose edge spans were collected a window at a time
+    # Returns the bad span ids of each page, since span ids are only unique within a page
+    page_count = len(edge_spans)
+    bad_span_ids = [set() for _ in edge_spans]
+    for edge in range(2):
+        counter = Counter(text for page_spans in edge_spans for _, text in page_spans[edge] if len(text) > 4)
+        common = find_common_text(counter, page_count, threshold)
+        for page_bad_span_ids, page_spans in zip(bad_span_ids, edge_spans):
+            page_bad_span_ids.update(span_id for span_id, text in page_spans[edge] if text in common)
+    return bad_span_ids
+
+
 def replace_leading_trailing_digits(string, replacement):
     string = re.sub(r'^\d+', replacement, string)
     string = re.sub(r'\d+$', replacement, string)
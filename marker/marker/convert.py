@@ -6,20 +6,29 @@ os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1" # For some reason, transformers
 
 
 import pypdfium2 as pdfium # Needs to be at the top to avoid warnings
+import hashlib
+import json
+import queue
+import threading
+from importlib import metadata
+from io import BytesIO
 from PIL import Image
 
 from marker.utils import flush_cuda_memory
 from marker.tables.table import format_tables
 from marker.debug.data import dump_bbox_debug_data, draw_page_debug_images
-from marker.layout.layout import surya_layout, annotate_block_types
-from marker.layout.order import surya_order, sort_blocks_in_reading_order
+from marker.layout.layout import surya_layout, annotate_block_types, get_batch_size as get_layout_batch_size
+from marker.layout.order import surya_order, sort_blocks_in_reading_order, get_batch_size as get_order_batch_size
 from marker.ocr.lang import replace_langs_with_codes, validate_langs
-from marker.ocr.detection import surya_detection
-from marker.ocr.recognition import run_ocr
+from marker.ocr.detection import surya_detection, get_batch_size as get_detection_batch_size
+from marker.ocr.recognition import run_ocr, get_batch_size as get_recognition_batch_size
+from marker.ocr.heuristics import no_text_found
 from marker.pdf.extract_text import get_text_blocks
-from marker.cleaners.headers import filter_header_footer, filter_common_titles
+from marker.cleaners.headers import filter_header_footer, filter_common_titles, get_edge_spans, filter_edge_spans
 from marker.equations.equations import replace_equations
-from marker.pdf.utils import find_filetype
+from marker.equations.inference import get_batch_size as get_texify_batch_size
+from marker.pdf.utils import find_filetype, pdfium_lock
+from marker.pdf.images import PageImageCache
 from marker.cleaners.code import identify_code_blocks, indent_blocks
 from marker.cleaners.bullets import replace_bullets
 from marker.cleaners.headings import split_heading_blocks, infer_heading_levels
@@ -28,23 +37,167 @@ from marker.postprocessors.markdown import merge_spans, merge_lines, get_full_te
 from marker.cleaners.text import cleanup_text
 from marker.images.extract import extract_images
 from marker.images.save import images_to_dict
+from marker.schema.page import Page
 from marker.cleaners.toc import compute_toc
+from marker.timings import StageTimings, batch_count
 
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Union, NamedTuple
 from marker.settings import settings
 
 
-def convert_single_pdf(
+CACHE_VERSION = 2 # Bump whenever a change to marker changes conversion output
+
+# Settings that change conversion output
+CACHE_KEY_SETTINGS = [
+    "EXTRACT_IMAGES", "PAGINATE_OUTPUT", "PAGE_SEPARATOR", "DEFAULT_LANG", "OCR_ENGINE", "TORCH_DEVICE_MODEL",
+    "IMAGE_DPI", "SURYA_DETECTOR_DPI", "SURYA_OCR_DPI", "TEXIFY_DPI", "SURYA_LAYOUT_DPI", "SURYA_ORDER_DPI", "SURYA_TABLE_DPI",
+    "TEXIFY_MODEL_NAME", "TEXIFY_MODEL_MAX", "LAYOUT_MODEL_CHECKPOINT", "ORDER_MAX_BBOXES",
+    "BAD_SPAN_TYPES", "BBOX_INTERSECTION_THRESH", "TABLE_INTERSECTION_THRESH",
+    "HEADING_LEVEL_COUNT", "HEADING_MERGE_THRESHOLD", "HEADING_DEFAULT_LEVEL",
+]
+
+# The other model checkpoints are the defaults of these packages
+CACHE_KEY_PACKAGES = ["marker-pdf", "surya-ocr", "texify", "tabled-pdf", "pdftext", "pypdfium2"]
+
+
+def package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def get_cache_backend(max_pages, start_page, langs, ocr_all_pages, window_size=None):
+    # Conversion output depends on the options, settings, models and code, so all of them are part of the key
+    key = {
+        "start_page": start_page or 0,
+        "max_pages": max_pages,
+        "langs": langs or [],
+        "ocr_all_pages": ocr_all_pages,
+        "window_size": window_size,
+        "settings": {name: getattr(settings, name) for name in CACHE_KEY_SETTINGS},
+        "packages": {name: package_version(name) for name in CACHE_KEY_PACKAGES},
+    }
+    key_hash = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"marker-v{CACHE_VERSION}-{key_hash}"
+
+
+def load_cached_conversion(extraction_cache, digest: str, backend: str):
+    entry = extraction_cache.get(digest, backend)
+    if entry is None or "markdown" not in entry["meta"]:
+        return None
+
+    doc_images = {}
+    for name in entry["blobs"]:
+        image_bytes = extraction_cache.read_blob(digest, backend, name)
+        if image_bytes is None:
+            return None
+        doc_images[name] = Image.open(BytesIO(image_bytes))
+    return entry["meta"]["markdown"], doc_images, entry["meta"]["out_meta"]
+
+
+def save_cached_conversion(extraction_cache, digest: str, backend: str, page_count: int, full_text: str, doc_images: Dict[str, Image.Image], out_meta: Dict):
+    blobs = {}
+    for name, image in doc_images.items():
+        buffered = BytesIO()
+        image.save(buffered, format="PNG")
+        blobs[name] = buffered.getvalue()
+
+    extraction_cache.put(
+        digest,
+        backend,
+        page_count,
+        {},
+        meta={"markdown": full_text, "out_meta": out_meta},
+        blobs=blobs
+    )
+
+
+class DocumentStats(NamedTuple):
+    # Statistics that need every page, collected from the pdf text before the windows run
+    no_text: bool
+
+
+def collect_document_stats(pages: List[Page]) -> DocumentStats:
+    return DocumentStats(
+        no_text=no_text_found(pages)
+    )
+
+
+def release_page_intermediates(pages: List[Page]):
+    # Later stages only need the layout boxes, so drop the detection heatmaps, segmentation maps and character data
+    for page in pages:
+        page.text_lines = None
+        page.char_blocks = None
+        if page.layout is not None:
+            page.layout.segmentation_map = None
+
+
+def release_unused_renders(pages: List[Page], page_images: PageImageCache, labels_by_dpi: Dict[int, set]):
+    # Keep each DPI's renders only on pages whose layout has one of its labels
+    page_images.retain(list(labels_by_dpi))
+    for dpi, labels in labels_by_dpi.items():
+        unused = [pnum for pnum, page in enumerate(pages) if page.layout is None or not any(b.label in labels for b in page.layout.bboxes)]
+        page_images.release(dpi, unused)
+
+
+def merge_stats(total: Dict, stats: Optional[Dict]):
+    # Add the stats of a window to the document totals
+    for key, value in (stats or {}).items():
+        if isinstance(value, dict):
+            merge_stats(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+        elif total.get(key) in (None, "none"):
+            total[key] = value
+
+
+class ConversionState:
+    # Everything one document carries from one conversion stage to the next
+    def __init__(self, fname: str, langs: List[str], out_meta: Dict, ocr_all_pages: bool, window_size: Optional[int] = None):
+        self.fname = fname
+        self.langs = langs
+        self.out_meta = out_meta
+        self.ocr_all_pages = ocr_all_pages
+        self.window_size = window_size # Pages to run through the model stages at once, all of them if None
+        self.result = None # Set as soon as the output is known, the remaining stages are skipped
+        self.doc = None
+        self.doc_page_count = 0
+        self.pages = None
+        self.page_images = None
+        self.filtered = None
+        self.images_extracted = False
+        self.edge_spans = None # Header and footer candidates of each page, collected by the windows and filtered once all have run
+        self.extraction_cache = None
+        self.cache_digest = None
+        self.cache_backend = None
+        self.timings = StageTimings(fname)
+
+
+def close_document(state: ConversionState):
+    # Drop the page renders and close the pdf here, rather than leaving it to the gc, which could run on any thread
+    if state.page_images is not None:
+        state.page_images.release()
+    if state.doc is not None:
+        with pdfium_lock:
+            state.doc.close()
+        state.doc = None
+
+
+def prepare_document(
         fname: str,
-        model_lst: List,
         max_pages: int = None,
         start_page: int = None,
         metadata: Optional[Dict] = None,
         langs: Optional[List[str]] = None,
-        batch_multiplier: int = 1,
-        ocr_all_pages: bool = False
-) -> Tuple[str, Dict[str, Image.Image], Dict]:
+        ocr_all_pages: bool = False,
+        extraction_cache=None,
+        prerender: bool = False,
+        window_size: Optional[int] = None
+) -> ConversionState:
+    # CPU stage: pdf text extraction, and optionally the page renders the detection model needs
     ocr_all_pages = ocr_all_pages or settings.OCR_ALL_PAGES
+    window_size = window_size or settings.WINDOW_SIZE
 
     if metadata:
         langs = metadata.get("languages", langs)
@@ -60,111 +213,462 @@ def convert_single_pdf(
         "languages": langs,
         "filetype": filetype,
     }
+    state = ConversionState(fname, langs, out_meta, ocr_all_pages, window_size)
 
     if filetype == "other": # We can't process this file
-        return "", {}, out_meta
+        state.result = "", {}, out_meta
+        return state
+
+    # Reuse an earlier conversion of the same file with the same options
+    if extraction_cache is not None:
+        state.extraction_cache = extraction_cache
+        state.cache_digest = extraction_cache.digest_file(fname)
+        state.cache_backend = get_cache_backend(max_pages, start_page, langs, ocr_all_pages, window_size)
+        cached = load_cached_conversion(extraction_cache, state.cache_digest, state.cache_backend)
+        if cached is not None:
+            state.result = cached
+            return state
+
+    try:
+        load_document(state, max_pages, start_page, prerender)
+    except Exception:
+        close_document(state)
+        raise
+    return state
+
+
+def load_document(state: ConversionState, max_pages: Optional[int], start_page: Optional[int], prerender: bool):
+    fname = state.fname
 
     # Get initial text blocks from the pdf
-    doc = pdfium.PdfDocument(fname)
-    pages, toc = get_text_blocks(
-        doc,
-        fname,
-        max_pages=max_pages,
-        start_page=start_page
-    )
-    out_meta.update({
+    with state.timings.stage("extraction") as stage:
+        with pdfium_lock:
+            doc = pdfium.PdfDocument(fname)
+            state.doc_page_count = len(doc)
+        state.doc = doc
+        pages, toc = get_text_blocks(
+            doc,
+            fname,
+            max_pages=max_pages,
+            start_page=start_page
+        )
+        stage.items.update(pages=len(pages), lines=sum(len(p.get_all_lines()) for p in pages))
+    state.out_meta.update({
         "pdf_toc": toc,
         "pages": len(pages),
     })
 
     # Trim pages from doc to align with start page
     if start_page:
-        for page_idx in range(start_page):
-            doc.del_page(0)
+        with pdfium_lock:
+            for page_idx in range(start_page):
+                doc.del_page(0)
 
-    # Unpack models from list
-    texify_model, layout_model, order_model, detection_model, ocr_model, table_rec_model = model_lst
+    state.pages = pages
 
-    # Identify text lines on pages
-    surya_detection(doc, pages, detection_model, batch_multiplier=batch_multiplier)
-    flush_cuda_memory()
+    # Every stage draws its page renders from here, so each page is rasterized once per DPI
+    state.page_images = PageImageCache(doc)
 
-    # OCR pages as needed
-    pages, ocr_stats = run_ocr(doc, pages, langs, ocr_model, batch_multiplier=batch_multiplier, ocr_all_pages=ocr_all_pages)
-    flush_cuda_memory()
+    # Render ahead, so the model stage doesn't wait on pdfium
+    if prerender:
+        prerender_count = min(len(pages), state.window_size or len(pages))
+        with state.timings.stage("prerender", pages=prerender_count):
+            state.page_images.get_images(list(range(prerender_count)), settings.SURYA_DETECTOR_DPI)
 
-    out_meta["ocr_stats"] = ocr_stats
-    if len([b for p in pages for b in p.blocks]) == 0:
-        print(f"Could not extract any text blocks for {fname}")
-        return "", {}, out_meta
 
-    surya_layout(doc, pages, layout_model, batch_multiplier=batch_multiplier)
-    flush_cuda_memory()
+def run_page_models(state: ConversionState, doc, pages: List[Page], page_images: PageImageCache, model_lst: List, batch_multiplier: int = 1, page_offset: int = 0, doc_stats: Optional[DocumentStats] = None) -> Tuple[List[Page], Dict, Optional[Dict]]:
+    # Detection, OCR, layout, order, tables and equations, with the cleaners between them, for pages starting at page_offset
+    # Returns the pages, the OCR stats, and the block stats, which are None if a whole document has no text
+    fname = state.fname
+    timings = state.timings
+    window = page_offset if doc_stats is not None else None
+
+    # Unpack models from list
+    texify_model, layout_model, order_model, detection_model, ocr_model, table_rec_model = model_lst
 
-    # Find headers and footers
-    bad_span_ids = filter_header_footer(pages)
-    out_meta["block_stats"] = {"header_footer": len(bad_span_ids)}
+    # Identify text lines on pages
+    with timings.stage("detection", window, pages=len(pages)) as stage:
+        surya_detection(doc, pages, detection_model, batch_multiplier=batch_multiplier, page_images=page_images)
+        flush_cuda_memory()
+        stage.batches = batch_count(len(pages), int(get_detection_batch_size() * batch_multiplier))
 
-    # Add block types in
-    annotate_block_types(pages)
+    # OCR pages as needed
+    with timings.stage("ocr", window) as stage:
+        pages, ocr_stats = run_ocr(
+            doc,
+            pages,
+            state.langs,
+            ocr_model,
+            batch_multiplier=batch_multiplier,
+            ocr_all_pages=state.ocr_all_pages,
+            page_images=page_images,
+            no_text=doc_stats.no_text if doc_stats else None,
+            page_offset=page_offset
+        )
+        flush_cuda_memory()
+        ocr_lines = sum(len(p.text_lines.bboxes) for p in pages if p.ocr_method == "surya")
+        stage.items.update(pages=ocr_stats["ocr_pages"], lines=ocr_lines)
+        if ocr_stats["ocr_engine"] == "surya":
+            stage.batches = batch_count(ocr_lines, int(get_recognition_batch_size() * batch_multiplier))
+
+    # A window without text can still be followed by windows with text
+    if doc_stats is None and len([b for p in pages for b in p.blocks]) == 0:
+        return pages, ocr_stats, None
+
+    with timings.stage("layout", window, pages=len(pages)) as stage:
+        surya_layout(doc, pages, layout_model, batch_multiplier=batch_multiplier, page_images=page_images)
+        flush_cuda_memory()
+        stage.batches = batch_count(len(pages), int(get_layout_batch_size() * batch_multiplier))
+
+        # Find headers and footers, windows only see some of the pages so finish_document filters them
+        if doc_stats is None:
+            bad_span_ids = filter_header_footer(pages)
+            block_stats = {"header_footer": len(bad_span_ids)}
+        else:
+            bad_span_ids = []
+            state.edge_spans.extend(get_edge_spans(page) for page in pages)
+            block_stats = {}
+
+        # Add block types in
+        annotate_block_types(pages)
+        stage.items["blocks"] = sum(len(p.blocks) for p in pages)
 
     # Find reading order for blocks
     # Sort blocks by reading order
-    surya_order(doc, pages, order_model, batch_multiplier=batch_multiplier)
-    sort_blocks_in_reading_order(pages)
-    flush_cuda_memory()
-
-    # Dump debug data if flags are set
-    draw_page_debug_images(fname, pages)
-    dump_bbox_debug_data(fname, pages)
+    with timings.stage("order", window, pages=len(pages)) as stage:
+        surya_order(doc, pages, order_model, batch_multiplier=batch_multiplier, page_images=page_images)
+        sort_blocks_in_reading_order(pages)
+        flush_cuda_memory()
+        stage.batches = batch_count(len(pages), int(get_order_batch_size() * batch_multiplier))
+
+    # Only tables and the equation and figure crops still need page renders, on the pages that have them
+    labels_by_dpi = {settings.SURYA_TABLE_DPI: {"Table"}}
+    labels_by_dpi.setdefault(settings.IMAGE_DPI, set()).update(["Formula", "Figure", "Picture"])
+    release_unused_renders(pages, page_images, labels_by_dpi)
+
+    # Dump debug data if flags are set, windows dump once the whole document is done
+    if doc_stats is None:
+        draw_page_debug_images(fname, pages)
+        dump_bbox_debug_data(fname, pages)
 
     # Fix code blocks
-    code_block_count = identify_code_blocks(pages)
-    out_meta["block_stats"]["code"] = code_block_count
-    indent_blocks(pages)
+    with timings.stage("code", window) as stage:
+        code_block_count = identify_code_blocks(pages)
+        block_stats["code"] = code_block_count
+        indent_blocks(pages)
+        stage.items["code_blocks"] = code_block_count
 
     # Fix table blocks
-    table_count = format_tables(pages, doc, fname, detection_model, table_rec_model, ocr_model)
-    out_meta["block_stats"]["table"] = table_count
+    with timings.stage("tables", window) as stage:
+        table_count = format_tables(pages, doc, fname, detection_model, table_rec_model, ocr_model, page_images=page_images, page_offset=page_offset)
+        block_stats["table"] = table_count
+        stage.items["tables"] = table_count
+    if settings.SURYA_TABLE_DPI != settings.IMAGE_DPI:
+        page_images.release(settings.SURYA_TABLE_DPI)
 
     for page in pages:
         for block in page.blocks:
             block.filter_spans(bad_span_ids)
             block.filter_bad_span_types()
 
-    filtered, eq_stats = replace_equations(
-        doc,
-        pages,
-        texify_model,
-        batch_multiplier=batch_multiplier
-    )
-    flush_cuda_memory()
-    out_meta["block_stats"]["equations"] = eq_stats
+    with timings.stage("equations", window) as stage:
+        filtered, eq_stats = replace_equations(
+            doc,
+            pages,
+            texify_model,
+            batch_multiplier=batch_multiplier,
+            page_images=page_images,
+            page_offset=page_offset
+        )
+        flush_cuda_memory()
+        block_stats["equations"] = eq_stats
+        stage.items["equations"] = eq_stats["equations"]
+        stage.batches = batch_count(eq_stats["equations"], get_texify_batch_size() * batch_multiplier)
+
+    # Figure extraction is the last stage that crops from the renders
+    release_unused_renders(pages, page_images, {settings.IMAGE_DPI: {"Figure", "Picture"} if settings.EXTRACT_IMAGES else set()})
+    return filtered, ocr_stats, block_stats
+
+
+def run_model_stages(state: ConversionState, model_lst: List, batch_multiplier: int = 1):
+    # Model stage: all of the document at once, or a window of pages at a time for long documents
+    if state.window_size and len(state.pages) > state.window_size:
+        run_windowed_model_stages(state, model_lst, batch_multiplier=batch_multiplier)
+        return
+
+    pages, ocr_stats, block_stats = run_page_models(state, state.doc, state.pages, state.page_images, model_lst, batch_multiplier=batch_multiplier)
+    state.pages = pages
+    state.out_meta["ocr_stats"] = ocr_stats
+    if block_stats is None:
+        print(f"Could not extract any text blocks for {state.fname}")
+        close_document(state)
+        state.result = "", {}, state.out_meta
+        return
+
+    state.out_meta["block_stats"] = block_stats
+    state.filtered = pages
+
+
+def run_windowed_model_stages(state: ConversionState, model_lst: List, batch_multiplier: int = 1):
+    pages = state.pages
+
+    # First pass over the pdf text, for the statistics that need the whole document
+    doc_stats = collect_document_stats(pages)
+
+    ocr_stats = {}
+    block_stats = {}
+    state.edge_spans = []
+    for start in range(0, len(pages), state.window_size):
+        end = min(start + state.window_size, len(pages))
+
+        # The stages address pages from 0, so each window gets a document of its own pages
+        with pdfium_lock:
+            window_doc = pdfium.PdfDocument.new()
+            window_doc.import_pages(state.doc, pages=list(range(start, end)))
+        window_images = state.page_images.window(start, end)
+
+        window_pages, window_ocr_stats, window_block_stats = run_page_models(
+            state,
+            window_doc,
+            pages[start:end],
+            window_images,
+            model_lst,
+            batch_multiplier=batch_multiplier,
+            page_offset=start,
+            doc_stats=doc_stats
+        )
+
+        # Crop the figures while the window's renders are around
+        if settings.EXTRACT_IMAGES:
+            with state.timings.stage("images", start) as stage:
+                extract_images(window_doc, window_pages, page_images=window_images)
+                stage.items["images"] = sum(len(p.images or []) for p in window_pages)
+
+        window_images.release()
+        with pdfium_lock:
+            window_doc.close()
+        if not settings.DEBUG:
+            release_page_intermediates(window_pages)
+
+        pages[start:end] = window_pages
+        merge_stats(ocr_stats, window_ocr_stats)
+        merge_stats(block_stats, window_block_stats)
+
+    state.images_extracted = True
+    state.out_meta["ocr_stats"] = ocr_stats
+    state.out_meta["block_stats"] = block_stats
+
+    draw_page_debug_images(state.fname, pages)
+    dump_bbox_debug_data(state.fname, pages)
+
+    if len([b for p in pages for b in p.blocks]) == 0:
+        print(f"Could not extract any text blocks for {state.fname}")
+        close_document(state)
+        state.result = "", {}, state.out_meta
+        return
+
+    state.filtered = pages
+
+
+def finish_document(state: ConversionState) -> Tuple[str, Dict[str, Image.Image], Dict]:
+    # CPU stage: figure extraction and markdown generation
+    if state.result is not None:
+        add_timings(state, state.result[2])
+        return state.result
+
+    doc, pages, page_images, out_meta = state.doc, state.pages, state.page_images, state.out_meta
+
+    # Headers and footers of windowed documents, now that every page has been through OCR and layout
+    if state.edge_spans is not None:
+        bad_span_ids = filter_edge_spans(state.edge_spans)
+        for page, page_bad_span_ids in zip(state.filtered, bad_span_ids):
+            for block in page.blocks:
+                block.filter_spans(page_bad_span_ids)
+        out_meta["block_stats"]["header_footer"] = sum(len(ids) for ids in bad_span_ids)
 
     # Extract images and figures
-    if settings.EXTRACT_IMAGES:
-        extract_images(doc, pages)
+    if settings.EXTRACT_IMAGES and not state.images_extracted:
+        with state.timings.stage("images") as stage:
+            extract_images(doc, pages, page_images=page_images)
+            stage.items["images"] = sum(len(p.images or []) for p in pages)
+    close_document(state)
+
+    with state.timings.stage("markdown", pages=len(pages)) as stage:
+        # Split out headers
+        split_heading_blocks(pages)
+        infer_heading_levels(pages)
+        find_bold_italic(pages)
+
+        # Use headers to compute a table of contents
+        out_meta["computed_toc"] = compute_toc(pages)
+
+        # Copy to avoid changing original data
+        merged_lines = merge_spans(state.filtered)
+        text_blocks = merge_lines(merged_lines)
+        text_blocks = filter_common_titles(text_blocks)
+        full_text = get_full_text(text_blocks)
+
+        # Handle empty blocks being joined
+        full_text = cleanup_text(full_text)
+
+        # Replace bullet characters with a -
+        full_text = replace_bullets(full_text)
+
+        doc_images = images_to_dict(pages)
+        stage.items["blocks"] = len(text_blocks)
+
+    # Saved before the timings are added, so cache hits don't report an earlier run's timings
+    if state.extraction_cache is not None:
+        save_cached_conversion(state.extraction_cache, state.cache_digest, state.cache_backend, state.doc_page_count, full_text, doc_images, out_meta)
 
-    # Split out headers
-    split_heading_blocks(pages)
-    infer_heading_levels(pages)
-    find_bold_italic(pages)
+    add_timings(state, out_meta)
+    return full_text, doc_images, out_meta
 
-    # Use headers to compute a table of contents
-    out_meta["computed_toc"] = compute_toc(pages)
 
-    # Copy to avoid changing original data
-    merged_lines = merge_spans(filtered)
-    text_blocks = merge_lines(merged_lines)
-    text_blocks = filter_common_titles(text_blocks)
-    full_text = get_full_text(text_blocks)
+def add_timings(state: ConversionState, out_meta: Dict):
+    if not state.timings.records:
+        return
+    out_meta["timings"] = state.timings.summary()
+    state.timings.write_trace()
 
-    # Handle empty blocks being joined
-    full_text = cleanup_text(full_text)
 
-    # Replace bullet characters with a -
-    full_text = replace_bullets(full_text)
+def convert_single_pdf(
+        fname: str,
+        model_lst: List,
+        max_pages: int = None,
+        start_page: int = None,
+        metadata: Optional[Dict] = None,
+        langs: Optional[List[str]] = None,
+        batch_multiplier: int = 1,
+        ocr_all_pages: bool = False,
+        extraction_cache=None,
+        window_size: Optional[int] = None
+) -> Tuple[str, Dict[str, Image.Image], Dict]:
+    state = prepare_document(
+        fname,
+        max_pages=max_pages,
+        start_page=start_page,
+        metadata=metadata,
+        langs=langs,
+        ocr_all_pages=ocr_all_pages,
+        extraction_cache=extraction_cache,
+        window_size=window_size
+    )
+    if state.result is None:
+        run_model_stages(state, model_lst, batch_multiplier=batch_multiplier)
+    return finish_document(state)
 
-    doc_images = images_to_dict(pages)
 
-    return full_text, doc_images, out_meta
\ No newline at end of file
+def convert_pdfs_pipelined(
+        tasks: Iterable[Tuple[str, Optional[Dict]]],
+        model_lst: List,
+        max_pages: int = None,
+        langs: Optional[List[str]] = None,
+        batch_multiplier: int = 1,
+        ocr_all_pages: bool = False,
+        extraction_cache=None,
+        queue_size: int = settings.PIPELINE_QUEUE_SIZE,
+        window_size: Optional[int] = None
+) -> Iterator[Tuple[str, Union[Tuple[str, Dict[str, Image.Image], Dict], Exception]]]:
+    # Converts a stream of (fname, metadata) tasks with the stages of neighbouring documents overlapping.
+    # A thread extracts and renders the next documents, a second runs the models, and the caller
+    # generates the markdown of the previous document.  Bounded queues keep at most queue_size
+    # documents waiting between stages.  Yields (fname, result) in input order, where result is
+    # the convert_single_pdf output, or the exception that stopped that document.
+    # pdfium calls from the three threads are serialized by pdfium_lock; the model inference and
+    # markdown generation around them still overlap.
+    prepared = queue.Queue(maxsize=queue_size)
+    modeled = queue.Queue(maxsize=queue_size)
+    done = object()
+    stop = threading.Event()
+
+    def put(q, item):
+        # Give up once the consumer is gone, instead of blocking forever on a full queue
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def discard(state):
+        if isinstance(state, ConversionState):
+            close_document(state)
+
+    def prepare_worker():
+        try:
+            for fname, metadata in tasks:
+                try:
+                    state = prepare_document(
+                        fname,
+                        max_pages=max_pages,
+                        metadata=metadata,
+                        langs=langs,
+                        ocr_all_pages=ocr_all_pages,
+                        extraction_cache=extraction_cache,
+                        prerender=True,
+                        window_size=window_size
+                    )
+                except Exception as e:
+                    state = e
+                if not put(prepared, (fname, state)):
+                    discard(state)
+                    return
+        finally:
+            put(prepared, done)
+
+    def model_worker():
+        try:
+            while True:
+                item = prepared.get()
+                if item is done:
+                    return
+                fname, state = item
+                if isinstance(state, ConversionState) and state.result is None:
+                    try:
+                        run_model_stages(state, model_lst, batch_multiplier=batch_multiplier)
+                    except Exception as e:
+                        close_document(state)
+                        state = e
+                if not put(modeled, (fname, state)):
+                    discard(state)
+                    return
+        finally:
+            put(modeled, done)
+
+    workers = [
+        threading.Thread(target=prepare_worker, daemon=True),
+        threading.Thread(target=model_worker, daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while True:
+            item = modeled.get()
+            if item is done:
+                break
+            fname, state = item
+            if isinstance(state, ConversionState):
+                try:
+                    state = finish_document(state)
+                except Exception as e:
+                    discard(state)
+                    state = e
+            yield fname, state
+    finally:
+        stop.set()
+        # The model worker may be waiting for a document that will never come
+        try:
+            prepared.put_nowait(done)
+        except queue.Full:
+            pass
+        for worker in workers:
+            worker.join()
+        # Documents still queued when the consumer stopped early
+        for q in (prepared, modeled):
+            while not q.empty():
+                item = q.get_nowait()
+                if item is not done:
+                    discard(item[1])
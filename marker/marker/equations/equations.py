@@ -1,9 +1,9 @@
 from collections import defaultdict
 from copy import deepcopy
-from typing import List
+from typing import List, Optional
 
 from marker.equations.inference import get_total_texify_tokens, get_latex_batched
-from marker.pdf.images import render_bbox_image
+from marker.pdf.images import PageImageCache, crop_bbox_image
 from marker.schema.bbox import rescale_bbox
 from marker.schema.page import Page
 from marker.schema.block import Line, Span, Block, split_block_lines, find_insert_block
@@ -134,7 +134,7 @@ def insert_latex_block(page_blocks: Page, page_equation_blocks, predictions, pnu
     return success_count, fail_count, converted_spans
 
 
-def replace_equations(doc, pages: List[Page], texify_model, batch_multiplier=1):
+def replace_equations(doc, pages: List[Page], texify_model, batch_multiplier=1, page_images: Optional[PageImageCache] = None, page_offset: int = 0):
     unsuccessful_ocr = 0
     successful_ocr = 0
 
@@ -145,12 +145,18 @@ def replace_equations(doc, pages: List[Page], texify_model, batch_multiplier=1):
 
     eq_count = sum([len(x) for x in equation_blocks])
 
+    if page_images is None:
+        page_images = PageImageCache(doc)
+
     images = []
     token_counts = []
     for page_idx, page_equation_blocks in enumerate(equation_blocks):
-        page_obj = doc[page_idx]
+        if not page_equation_blocks:
+            continue
+        # All of a page's equations are cropped from a single render
+        page_image = page_images.get(page_idx, settings.IMAGE_DPI)
         for equation_idx, (insert_block_idx, insert_line_idx, token_count, block_text, equation_bbox) in enumerate(page_equation_blocks):
-            png_image = render_bbox_image(page_obj, pages[page_idx], equation_bbox)
+            png_image = crop_bbox_image(page_image, pages[page_idx], equation_bbox)
 
             images.append(png_image)
             token_counts.append(token_count)
@@ -168,7 +174,7 @@ def replace_equations(doc, pages: List[Page], texify_model, batch_multiplier=1):
             pages[page_idx],
             page_equation_blocks,
             page_predictions,
-            page_idx,
+            page_offset + page_idx,
             texify_model.processor
         )
         converted_spans.extend(converted_span)
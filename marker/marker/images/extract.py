@@ -1,5 +1,8 @@
+from typing import Optional
+
 from marker.images.save import get_image_filename
-from marker.pdf.images import render_bbox_image
+from marker.pdf.images import PageImageCache, render_bbox_image
+from marker.pdf.utils import pdfium_lock
 from marker.schema.bbox import rescale_bbox
 from marker.schema.block import find_insert_block, Span, Line
 from marker.settings import settings
@@ -34,9 +37,11 @@ def find_image_blocks(page):
     return image_blocks
 
 
-def extract_page_images(page_obj, page):
+def extract_page_images(page_obj, page, get_page_image=None):
+    # get_page_image returns the page rendered at IMAGE_DPI; it is only called if the page has images
     page.images = []
     image_blocks = find_image_blocks(page)
+    page_image = None
 
     for image_idx, (block_idx, line_idx, bbox) in enumerate(image_blocks):
         if block_idx >= len(page.blocks):
@@ -45,7 +50,9 @@ def extract_page_images(page_obj, page):
             continue
 
         block = page.blocks[block_idx]
-        image = render_bbox_image(page_obj, page, bbox)
+        if page_image is None and get_page_image is not None:
+            page_image = get_page_image()
+        image = render_bbox_image(page_obj, page, bbox, page_image)
         image_filename = get_image_filename(page, image_idx)
         image_markdown = f"\n\n![{image_filename}]({image_filename})\n\n"
         image_span = Span(
@@ -71,7 +78,13 @@ def extract_page_images(page_obj, page):
         page.images.append(image)
 
 
-def extract_images(doc, pages):
+def extract_images(doc, pages, page_images: Optional[PageImageCache] = None):
+    if page_images is None:
+        page_images = PageImageCache(doc)
+
     for page_idx, page in enumerate(pages):
-        page_obj = doc[page_idx]
-        extract_page_images(page_obj, page)
+        with pdfium_lock:
+            page_obj = doc[page_idx]
+        extract_page_images(page_obj, page, lambda: page_images.get(page_idx, settings.IMAGE_DPI))
+        with pdfium_lock:
+            page_obj.close()
@@ -1,9 +1,9 @@
 from collections import defaultdict
-from typing import List
+from typing import List, Optional
 
 from surya.layout import batch_layout_detection
 
-from marker.pdf.images import render_image
+from marker.pdf.images import PageImageCache, get_page_images
 from marker.schema.bbox import rescale_bbox
 from marker.schema.block import bbox_from_lines
 from marker.schema.page import Page
@@ -18,8 +18,8 @@ def get_batch_size():
     return 6
 
 
-def surya_layout(doc, pages: List[Page], layout_model, batch_multiplier=1):
-    images = [render_image(doc[pnum], dpi=settings.SURYA_LAYOUT_DPI) for pnum in range(len(pages))]
+def surya_layout(doc, pages: List[Page], layout_model, batch_multiplier=1, page_images: Optional[PageImageCache] = None):
+    images = get_page_images(doc, list(range(len(pages))), settings.SURYA_LAYOUT_DPI, page_images)
     text_detection_results = [p.text_lines for p in pages]
 
     processor = layout_model.processor
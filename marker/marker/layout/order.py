@@ -1,9 +1,9 @@
 from collections import defaultdict
-from typing import List
+from typing import List, Optional
 
 from surya.ordering import batch_ordering
 
-from marker.pdf.images import render_image
+from marker.pdf.images import PageImageCache, get_page_images
 from marker.pdf.utils import sort_block_group
 from marker.schema.bbox import rescale_bbox
 from marker.schema.page import Page
@@ -20,8 +20,8 @@ def get_batch_size():
     return 6
 
 
-def surya_order(doc, pages: List[Page], order_model, batch_multiplier=1):
-    images = [render_image(doc[pnum], dpi=settings.SURYA_ORDER_DPI) for pnum in range(len(pages))]
+def surya_order(doc, pages: List[Page], order_model, batch_multiplier=1, page_images: Optional[PageImageCache] = None):
+    images = get_page_images(doc, list(range(len(pages))), settings.SURYA_ORDER_DPI, page_images)
 
     # Get bboxes for all pages
     bboxes = []
@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
 
 from pypdfium2 import PdfDocument
 from surya.detection import batch_text_detection
 
-from marker.pdf.images import render_image
+from marker.pdf.images import PageImageCache, get_page_images
+from marker.pdf.utils import pdfium_lock
 from marker.schema.page import Page
 from marker.settings import settings
 
@@ -16,10 +17,11 @@ def get_batch_size():
     return 4
 
 
-def surya_detection(doc: PdfDocument, pages: List[Page], det_model, batch_multiplier=1):
+def surya_detection(doc: PdfDocument, pages: List[Page], det_model, batch_multiplier=1, page_images: Optional[PageImageCache] = None):
     processor = det_model.processor
-    max_len = min(len(pages), len(doc))
-    images = [render_image(doc[pnum], dpi=settings.SURYA_DETECTOR_DPI) for pnum in range(max_len)]
+    with pdfium_lock:
+        max_len = min(len(pages), len(doc))
+    images = get_page_images(doc, list(range(max_len)), settings.SURYA_DETECTOR_DPI, page_images)
 
     predictions = batch_text_detection(images, det_model, processor, batch_size=int(get_batch_size() * batch_multiplier))
     for (page, pred) in zip(pages, predictions):
@@ -12,7 +12,8 @@ from surya.ocr import run_recognition
 from marker.models import setup_recognition_model
 from marker.ocr.heuristics import should_ocr_page, no_text_found, detect_bad_ocr
 from marker.ocr.lang import langs_to_ids
-from marker.pdf.images import render_image
+from marker.pdf.images import PageImageCache, get_page_images
+from marker.pdf.utils import pdfium_lock
 from marker.schema.bbox import rescale_bbox
 from marker.schema.page import Page
 from marker.schema.block import Block, Line, Span
@@ -30,11 +31,13 @@ def get_batch_size():
     return 32
 
 
-def run_ocr(doc, pages: List[Page], langs: List[str], rec_model, batch_multiplier=1, ocr_all_pages=False) -> (List[Page], Dict):
+def run_ocr(doc, pages: List[Page], langs: List[str], rec_model, batch_multiplier=1, ocr_all_pages=False, page_images: Optional[PageImageCache] = None, no_text: Optional[bool] = None, page_offset: int = 0) -> (List[Page], Dict):
     ocr_pages = 0
     ocr_success = 0
     ocr_failed = 0
-    no_text = no_text_found(pages)
+    # Windows of a document pass in whether the whole document has text
+    if no_text is None:
+        no_text = no_text_found(pages)
     ocr_idxs = []
     for pnum, page in enumerate(pages):
         ocr_needed = should_ocr_page(page, no_text, ocr_all_pages=ocr_all_pages)
@@ -50,7 +53,7 @@ def run_ocr(doc, pages: List[Page], langs: List[str], rec_model, batch_multiplie
     if ocr_method is None or ocr_method == "None":
         return pages, {"ocr_pages": 0, "ocr_failed": 0, "ocr_success": 0, "ocr_engine": "none"}
     elif ocr_method == "surya":
-        new_pages = surya_recognition(doc, ocr_idxs, langs, rec_model, pages, batch_multiplier=batch_multiplier)
+        new_pages = surya_recognition(doc, ocr_idxs, langs, rec_model, pages, batch_multiplier=batch_multiplier, page_images=page_images, page_offset=page_offset)
     elif ocr_method == "ocrmypdf":
         new_pages = tesseract_recognition(doc, ocr_idxs, langs)
     else:
@@ -66,9 +69,9 @@ def run_ocr(doc, pages: List[Page], langs: List[str], rec_model, batch_multiplie
     return pages, {"ocr_pages": ocr_pages, "ocr_failed": ocr_failed, "ocr_success": ocr_success, "ocr_engine": ocr_method}
 
 
-def surya_recognition(doc, page_idxs, langs: List[str], rec_model, pages: List[Page], batch_multiplier=1) -> List[Optional[Page]]:
+def surya_recognition(doc, page_idxs, langs: List[str], rec_model, pages: List[Page], batch_multiplier=1, page_images: Optional[PageImageCache] = None, page_offset: int = 0) -> List[Optional[Page]]:
     # Slice images in higher resolution than detection happened in
-    images = [render_image(doc[pnum], dpi=settings.SURYA_OCR_DPI) for pnum in page_idxs]
+    images = get_page_images(doc, page_idxs, settings.SURYA_OCR_DPI, page_images)
     box_scale = settings.SURYA_OCR_DPI / settings.SURYA_DETECTOR_DPI
 
     processor = rec_model.processor
@@ -88,6 +91,7 @@ def surya_recognition(doc, page_idxs, langs: List[str], rec_model, pages: List[P
 
     new_pages = []
     for idx, (page_idx, result, old_page) in enumerate(zip(page_idxs, results, selected_pages)):
+        page_idx += page_offset
         text_lines = old_page.text_lines
         ocr_results = result.text_lines
         blocks = []
@@ -133,12 +137,13 @@ def tesseract_recognition(doc, page_idxs, langs: List[str]) -> List[Optional[Pag
 def generate_single_page_pdfs(doc, page_idxs) -> List[io.BytesIO]:
     pdf_pages = []
     for page_idx in page_idxs:
-        blank_doc = pdfium.PdfDocument.new()
-        blank_doc.import_pages(doc, pages=[page_idx])
-        assert len(blank_doc) == 1, "Failed to import page"
-
         in_pdf = io.BytesIO()
-        blank_doc.save(in_pdf)
+        with pdfium_lock:
+            blank_doc = pdfium.PdfDocument.new()
+            blank_doc.import_pages(doc, pages=[page_idx])
+            assert len(blank_doc) == 1, "Failed to import page"
+            blank_doc.save(in_pdf)
+            blank_doc.close()
         in_pdf.seek(0)
         pdf_pages.append(in_pdf)
     return pdf_pages
@@ -166,8 +171,10 @@ def _tesseract_recognition(in_pdf, langs: List[str]) -> Optional[Page]:
     with tempfile.NamedTemporaryFile() as f:
         f.write(out_pdf.getvalue())
         f.seek(0)
-        new_doc = pdfium.PdfDocument(f.name)
-        blocks, _ = get_text_blocks(new_doc, f.name, max_pages=1)
+        with pdfium_lock:
+            new_doc = pdfium.PdfDocument(f.name)
+            blocks, _ = get_text_blocks(new_doc, f.name, max_pages=1)
+            new_doc.close()
 
     page = blocks[0]
     page.ocr_method = "tesseract"
@@ -4,7 +4,7 @@ from typing import List, Optional, Dict
 import pypdfium2 as pdfium
 
 from marker.cleaners.toc import get_pdf_toc
-from marker.pdf.utils import font_flags_decomposer
+from marker.pdf.utils import font_flags_decomposer, pdfium_lock
 from marker.settings import settings
 from marker.schema.block import Span, Line, Block
 from marker.schema.page import Page
@@ -77,6 +77,12 @@ def pdftext_format_to_blocks(page, pnum: int) -> Page:
 
 
 def get_text_blocks(doc, fname, max_pages: Optional[int] = None, start_page: Optional[int] = None) -> (List[Page], Dict):
+    # pdftext opens the file with pdfium too
+    with pdfium_lock:
+        return _get_text_blocks(doc, fname, max_pages, start_page)
+
+
+def _get_text_blocks(doc, fname, max_pages: Optional[int] = None, start_page: Optional[int] = None) -> (List[Page], Dict):
     toc = get_pdf_toc(doc)
 
     if start_page:
@@ -100,15 +106,23 @@ def get_text_blocks(doc, fname, max_pages: Optional[int] = None, start_page: Opt
 
 def naive_get_text(doc):
     full_text = ""
-    for page_idx in range(len(doc)):
-        page = doc.get_page(page_idx)
-        text_page = page.get_textpage()
-        full_text += text_page.get_text_bounded() + "\n"
+    with pdfium_lock:
+        for page_idx in range(len(doc)):
+            page = doc.get_page(page_idx)
+            text_page = page.get_textpage()
+            full_text += text_page.get_text_bounded() + "\n"
+            text_page.close()
+            page.close()
     return full_text
 
 
 def get_length_of_text(fname: str) -> int:
-    doc = pdfium.PdfDocument(fname)
-    text = naive_get_text(doc).strip()
+    # Runs on the pipeline's prepare thread when filtering by length, so the document is opened and closed under the lock
+    with pdfium_lock:
+        doc = pdfium.PdfDocument(fname)
+        try:
+            text = naive_get_text(doc).strip()
+        finally:
+            doc.close()
 
     return len(text)
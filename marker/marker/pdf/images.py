@@ -1,27 +1,92 @@
+from typing import Dict, List, Optional, Tuple
+
 import pypdfium2 as pdfium
+from PIL import Image
 from pypdfium2 import PdfPage
 
+from marker.pdf.utils import pdfium_lock
 from marker.schema.page import Page
 from marker.schema.bbox import rescale_bbox
 from marker.settings import settings
 
 
 def render_image(page: pdfium.PdfPage, dpi):
-    image = page.render(
-        scale=dpi / 72,
-        draw_annots=False
-    ).to_pil()
-    image = image.convert("RGB")
+    with pdfium_lock:
+        bitmap = page.render(
+            scale=dpi / 72,
+            draw_annots=False
+        )
+        # Converting copies the pixels, so the bitmap can be freed here rather than by the gc on another thread
+        image = bitmap.to_pil().convert("RGB")
+        bitmap.close()
     return image
 
 
-def render_bbox_image(page_obj: PdfPage, page: Page, bbox):
-    png_image = render_image(page_obj, settings.IMAGE_DPI)
+class PageImageCache:
+    # Renders each page of a document once per DPI, and shares the images between stages
+    def __init__(self, doc: pdfium.PdfDocument, page_range: Optional[range] = None, images: Optional[Dict[Tuple[int, int], Image.Image]] = None):
+        self.doc = doc
+        self.page_range = page_range # Set on windows, which number the pages of page_range from 0
+        self.images: Dict[Tuple[int, int], Image.Image] = images if images is not None else {}
+
+    def doc_pnum(self, pnum: int) -> int:
+        return self.page_range[pnum] if self.page_range is not None else pnum
+
+    def get(self, pnum: int, dpi: int) -> Image.Image:
+        key = (self.doc_pnum(pnum), dpi)
+        if key not in self.images:
+            with pdfium_lock:
+                page = self.doc[key[0]]
+                try:
+                    self.images[key] = render_image(page, dpi)
+                finally:
+                    page.close()
+        return self.images[key]
+
+    def get_images(self, pnums: List[int], dpi: int) -> List[Image.Image]:
+        return [self.get(pnum, dpi) for pnum in pnums]
+
+    def window(self, start: int, end: int) -> "PageImageCache":
+        # A view of pages start to end that shares this cache's renders
+        return PageImageCache(self.doc, range(self.doc_pnum(start), self.doc_pnum(start) + end - start), self.images)
+
+    def owns(self, doc_pnum: int) -> bool:
+        return self.page_range is None or doc_pnum in self.page_range
+
+    def release(self, dpi: Optional[int] = None, pnums: Optional[List[int]] = None):
+        # Drop images once no later stage needs them; everything by default
+        pnums = set(self.doc_pnum(pnum) for pnum in pnums) if pnums is not None else None
+        for key in list(self.images):
+            pnum, image_dpi = key
+            if (dpi is None or image_dpi == dpi) and (pnums is None or pnum in pnums) and self.owns(pnum):
+                del self.images[key]
+
+    def retain(self, dpis: List[int]):
+        # Release every render that isn't at one of dpis
+        for key in list(self.images):
+            if key[1] not in dpis and self.owns(key[0]):
+                del self.images[key]
+
+
+def get_page_images(doc: pdfium.PdfDocument, pnums: List[int], dpi: int, page_images: Optional[PageImageCache] = None) -> List[Image.Image]:
+    if page_images is None:
+        page_images = PageImageCache(doc)
+    return page_images.get_images(pnums, dpi)
+
+
+def crop_bbox_image(page_image: Image.Image, page: Page, bbox):
     # Rescale original pdf bbox bounds to match png image size
-    png_bbox = [0, 0, png_image.size[0], png_image.size[1]]
+    png_bbox = [0, 0, page_image.size[0], page_image.size[1]]
     rescaled_merged = rescale_bbox(page.bbox, png_bbox, bbox)
 
     # Crop out only the equation image
-    png_image = png_image.crop(rescaled_merged)
+    png_image = page_image.crop(rescaled_merged)
     png_image = png_image.convert("RGB")
-    return png_image
\ No newline at end of file
+    return png_image
+
+
+def render_bbox_image(page_obj: PdfPage, page: Page, bbox, page_image: Optional[Image.Image] = None):
+    # Pass page_image, rendered at IMAGE_DPI, to take several crops from one render
+    if page_image is None:
+        page_image = render_image(page_obj, settings.IMAGE_DPI)
+    return crop_bbox_image(page_image, page, bbox)
\ No newline at end of file
@@ -1,9 +1,14 @@
+import threading
 from typing import Optional
 
 import filetype
 
 from marker.settings import settings
 
+# pdfium is not thread-safe, and the pipelined converter uses it from several threads, so every call goes through this lock
+# Reentrant, since locked helpers call each other
+pdfium_lock = threading.RLock()
+
 
 def find_filetype(fpath):
     kind = filetype.guess(fpath)
@@ -35,6 +35,12 @@ class Settings(BaseSettings):
         "application/pdf": "pdf",
     }
 
+    # Pipelined batch conversion
+    PIPELINE_QUEUE_SIZE: int = 2 # How many documents can wait between the CPU and model stages
+
+    # Windowed conversion
+    WINDOW_SIZE: Optional[int] = None # Run the model stages over this many pages at a time, so memory is bounded on long documents.  None runs the whole document at once
+
     # Text extraction
     PDFTEXT_CPU_WORKERS: int = 4 # How many CPU workers to use for pdf text extraction
 
@@ -88,6 +94,9 @@ class Settings(BaseSettings):
     # Output
     PAGE_SEPARATOR: str = "\n\n" + "-" * 48 + "\n\n"
 
+    # Instrumentation
+    TRACE_FILE: Optional[str] = None # Append the stage timings of every document to this JSON lines file
+
     # Debug
     DEBUG_DATA_FOLDER: str = os.path.join(BASE_DIR, "debug_data")
     DEBUG: bool = False
@@ -7,23 +7,26 @@ from tabled.inference.detection import merge_tables
 from surya.input.pdflines import get_page_text_lines
 from tabled.inference.recognition import get_cells, recognize_tables
 
-from marker.pdf.images import render_image
+from marker.pdf.images import PageImageCache
+from marker.pdf.utils import pdfium_lock
 from marker.schema.bbox import rescale_bbox
 from marker.schema.block import Line, Span, Block
 from marker.schema.page import Page
-from typing import List
+from typing import List, Optional
 
 from marker.settings import settings
 
 
-def get_table_boxes(pages: List[Page], doc: PdfDocument, fname):
+def get_table_boxes(pages: List[Page], doc: PdfDocument, fname, page_images: Optional[PageImageCache] = None, page_offset: int = 0):
+    if page_images is None:
+        page_images = PageImageCache(doc)
+
     table_imgs = []
     table_counts = []
     table_bboxes = []
     img_sizes = []
 
-    for page in pages:
-        pnum = page.pnum
+    for page_idx, page in enumerate(pages):
         # The bbox for the entire table
         bbox = [b.bbox for b in page.layout.bboxes if b.label == "Table"]
 
@@ -32,7 +35,7 @@ def get_table_boxes(pages: List[Page], doc: PdfDocument, fname):
             img_sizes.append(None)
             continue
 
-        highres_img = render_image(doc[pnum], dpi=settings.SURYA_TABLE_DPI)
+        highres_img = page_images.get(page_idx, settings.SURYA_TABLE_DPI)
 
         page_table_imgs = []
         page_bboxes = []
@@ -53,11 +56,13 @@ def get_table_boxes(pages: List[Page], doc: PdfDocument, fname):
         table_bboxes.extend(page_bboxes)
 
     table_idxs = [i for i, c in enumerate(table_counts) if c > 0]
-    sel_text_lines = get_page_text_lines(
-        fname,
-        table_idxs,
-        [hr for i, hr in enumerate(img_sizes) if i in table_idxs],
-    )
+    # Reads the pdf with pdftext, which uses pdfium
+    with pdfium_lock:
+        sel_text_lines = get_page_text_lines(
+            fname,
+            [page_offset + i for i in table_idxs],
+            [hr for i, hr in enumerate(img_sizes) if i in table_idxs],
+        )
     text_lines = []
     out_img_sizes = []
     for i in range(len(table_counts)):
@@ -76,13 +81,13 @@ def get_table_boxes(pages: List[Page], doc: PdfDocument, fname):
     return table_imgs, table_bboxes, table_counts, text_lines, out_img_sizes
 
 
-def format_tables(pages: List[Page], doc: PdfDocument, fname: str, detection_model, table_rec_model, ocr_model):
+def format_tables(pages: List[Page], doc: PdfDocument, fname: str, detection_model, table_rec_model, ocr_model, page_images: Optional[PageImageCache] = None, page_offset: int = 0):
     det_models = [detection_model, detection_model.processor]
     rec_models = [table_rec_model, table_rec_model.processor, ocr_model, ocr_model.processor]
 
     # Don't look at table cell detection tqdm output
     tqdm.disable = True
-    table_imgs, table_boxes, table_counts, table_text_lines, img_sizes = get_table_boxes(pages, doc, fname)
+    table_imgs, table_boxes, table_counts, table_text_lines, img_sizes = get_table_boxes(pages, doc, fname, page_images, page_offset)
     cells, needs_ocr = get_cells(table_imgs, table_boxes, img_sizes, table_text_lines, det_models, detect_boxes=settings.OCR_ALL_PAGES)
     tqdm.disable = False
 
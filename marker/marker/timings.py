@@ -0,0 +1,114 @@
+import json
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from marker.settings import settings
+
+trace_lock = threading.Lock()
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak / 1024
+
+
+def batch_count(item_count: int, batch_size: int) -> int:
+    if not item_count or not batch_size:
+        return 0
+    return math.ceil(item_count / batch_size)
+
+
+class StageRecord:
+    def __init__(self, stage: str, page_offset: Optional[int], items: Dict[str, int]):
+        self.stage = stage
+        self.page_offset = page_offset # First page of the window, None if the stage ran on the whole document
+        self.items = items # Pages, lines, tables, etc. processed, stages add counts once they know them
+        self.batches = None # Model batches run, None for stages without a model
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_delta_mb = 0.0
+
+    def to_dict(self) -> Dict:
+        record = {
+            "wall": round(self.wall, 4),
+            "cpu": round(self.cpu, 4),
+            "peak_rss_delta_mb": round(self.peak_rss_delta_mb, 1),
+            "items": self.items,
+        }
+        if self.batches is not None:
+            record["batches"] = self.batches
+        return record
+
+
+class StageTimings:
+    # Wall time, CPU time, peak RSS growth and item/batch counts for the stages of one document
+    # CPU time and RSS are per process, so with the pipelined converter they include the other documents in flight
+    def __init__(self, fname: str, trace_file: Optional[str] = None):
+        self.fname = fname
+        self.trace_file = trace_file or settings.TRACE_FILE
+        self.records: List[StageRecord] = []
+
+    @contextmanager
+    def stage(self, name: str, page_offset: Optional[int] = None, **items):
+        record = StageRecord(name, page_offset, items)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        # The peak only ever goes up, so the delta is how far this stage raised it
+        rss_start = peak_rss_mb()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - wall_start
+            record.cpu = time.process_time() - cpu_start
+            record.peak_rss_delta_mb = peak_rss_mb() - rss_start
+            self.records.append(record)
+
+    def summary(self) -> Dict[str, Dict]:
+        # Stages that ran once per window are added up
+        summary = {}
+        for record in self.records:
+            record_dict = record.to_dict()
+            total = summary.get(record.stage)
+            if total is None:
+                summary[record.stage] = record_dict
+                continue
+
+            total["wall"] = round(total["wall"] + record_dict["wall"], 4)
+            total["cpu"] = round(total["cpu"] + record_dict["cpu"], 4)
+            total["peak_rss_delta_mb"] = round(total["peak_rss_delta_mb"] + record_dict["peak_rss_delta_mb"], 1)
+            total["items"] = {key: total["items"].get(key, 0) + record_dict["items"].get(key, 0) for key in {**total["items"], **record_dict["items"]}}
+            if "batches" in record_dict:
+                total["batches"] = total.get("batches", 0) + record_dict["batches"]
+        return summary
+
+    def write_trace(self):
+        # One JSON line per stage run, appended so many documents and processes can share a file
+        if not self.trace_file or not self.records:
+            return
+
+        lines = []
+        for record in self.records:
+            line = {"fname": self.fname, "stage": record.stage}
+            if record.page_offset is not None:
+                line["page_offset"] = record.page_offset
+            line.update(record.to_dict())
+            lines.append(json.dumps(line))
+
+        with trace_lock:
+            with open(self.trace_file, "a") as f:
+                f.write("\n".join(lines) + "\n")